@@ -0,0 +1,208 @@
+"""Offline batch processing of manifest PDFs, without the web server.
+
+Extracts every PDF given as a file, directory or glob pattern across a
+process pool, parses every booking found with the same code as the API
+(extract_all_pages -> build_booking_index -> parse_booking) and writes one
+record per booking to JSONL or CSV.
+
+Progress is tracked in ``<out>.done``; with --resume, files already listed
+there are skipped and the output is appended to. Each completed file's
+records are flushed before it is marked done, and the byte offset stored
+with it lets a resumed run drop records from a file that was interrupted
+half-way.
+
+Usage (from the repository root):
+
+    python -m api.batch archive/2026-10/ --out bookings.jsonl --workers 4
+    python -m api.batch "archive/**/*.pdf" --out bookings.csv --format csv --resume
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from api.main import (
+    EXPORT_CSV_FIELDS,
+    build_document,
+    export_csv_row,
+    extract_all_pages,
+    new_session,
+    parse_export_records,
+)
+
+
+def collect_inputs(patterns):
+    """Expand files, directories (*.pdf inside) and glob patterns into a sorted list of PDFs."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.pdf")) + glob.glob(os.path.join(pattern, "*.PDF"))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        paths.update(os.path.abspath(p) for p in matches if p.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def process_file(path):
+    """Extract and parse one manifest. Runs in a worker process."""
+    t = time.perf_counter()
+    try:
+        pages = extract_all_pages(path)
+        entry = new_session([build_document(path, pages)])
+        records = parse_export_records(entry, list(entry["index"]))
+    except Exception as e:
+        return {"path": path, "error": str(e), "seconds": time.perf_counter() - t}
+    return {
+        "path": path,
+        "pages": len(pages),
+        "bookings": len(entry["index"]),
+        "records": records,
+        "seconds": time.perf_counter() - t,
+    }
+
+
+def _ignore_sigint():
+    # Ctrl-C is handled by the parent, which stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _stop_workers(pool):
+    """Cancel queued files and terminate the files in progress."""
+    # ProcessPoolExecutor has no public way to stop running calls before
+    # 3.14; take the workers before shutdown() drops its reference to them
+    workers = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in workers:
+        proc.terminate()
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return {"path": path, "size": st.st_size, "mtime": st.st_mtime}
+
+
+def load_done(state_path):
+    """Return ({path: state}, output offset) from a progress file."""
+    done = {}
+    offset = 0
+    if not os.path.exists(state_path):
+        return done, offset
+    with open(state_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                state = json.loads(line)
+            except ValueError:
+                break  # partially written last line
+            done[state["path"]] = state
+            offset = state["offset"]
+    return done, offset
+
+
+def format_records(records, fmt):
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for record in records:
+            writer.writerow(export_csv_row(record))
+        return buf.getvalue()
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    parser.add_argument("--out", required=True, help="output file")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="output format (default: from the --out extension, else jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--resume", action="store_true", help="skip files completed by a previous run")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.out.lower().endswith(".csv") else "jsonl")
+    state_path = args.out + ".done"
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("No PDF files found", file=sys.stderr)
+        return 1
+
+    done, offset = load_done(state_path) if args.resume else ({}, 0)
+    out_size = os.path.getsize(args.out) if os.path.exists(args.out) else None
+    if offset and (out_size is None or out_size < offset):
+        # The records of the "done" files are gone; skipping them would lose them
+        print(f"⚠️ {args.out} is missing or shorter than {state_path} records; starting from scratch",
+              file=sys.stderr)
+        done, offset = {}, 0
+    pending = []
+    for path in inputs:
+        state = done.get(path)
+        key = _file_key(path)
+        if state and state["size"] == key["size"] and state["mtime"] == key["mtime"]:
+            continue
+        pending.append(path)
+    print(f"{len(inputs)} file(s), {len(inputs) - len(pending)} already done, {len(pending)} to process")
+
+    resuming = bool(offset)
+    out = open(args.out, "r+" if resuming else "w", encoding="utf-8", newline="")
+    state_file = open(state_path, "a" if resuming else "w", encoding="utf-8")
+    failed = 0
+    interrupted = False
+    total_pages = total_records = 0
+    started = time.perf_counter()
+    try:
+        # Drop anything written after the last completed file
+        out.seek(offset)
+        out.truncate()
+        if fmt == "csv" and offset == 0:
+            csv.writer(out).writerow(EXPORT_CSV_FIELDS)
+
+        pool = ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_ignore_sigint)
+        try:
+            futures = [pool.submit(process_file, path) for path in pending]
+            for n, future in enumerate(as_completed(futures), 1):
+                res = future.result()
+                name = os.path.relpath(res["path"])
+                if "error" in res:
+                    failed += 1
+                    print(f"[{n}/{len(pending)}] ❌ {name}: {res['error']}")
+                    continue
+                out.write(format_records(res["records"], fmt))
+                out.flush()
+                os.fsync(out.fileno())
+                state_file.write(json.dumps({**_file_key(res["path"]), "offset": out.tell()}) + "\n")
+                state_file.flush()
+                total_pages += res["pages"]
+                total_records += len(res["records"])
+                secs = res["seconds"] or 1e-9
+                print(f"[{n}/{len(pending)}] ✅ {name}: {res['pages']} pages, {res['bookings']} bookings "
+                      f"in {secs:.2f}s ({res['pages'] / secs:.1f} pages/s, {res['bookings'] / secs:.1f} bookings/s)")
+        except KeyboardInterrupt:
+            # Leaving the pool normally would still process every queued file
+            interrupted = True
+            _stop_workers(pool)
+        finally:
+            if not interrupted:
+                pool.shutdown()
+    finally:
+        out.close()
+        state_file.close()
+
+    elapsed = time.perf_counter() - started
+    if interrupted:
+        print(f"Interrupted: {total_records} records from {total_pages} pages in {elapsed:.1f}s; "
+              f"rerun with --resume to continue", file=sys.stderr)
+        return 130
+    print(f"Done: {total_records} records from {total_pages} pages in {elapsed:.1f}s, {failed} failed -> {args.out}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
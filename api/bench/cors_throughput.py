@@ -0,0 +1,140 @@
+"""Requests/sec on /api/search with the pure-ASGI CORS layer vs the old stack.
+
+The "legacy" app serves the same routes behind the previous middleware
+stack: Starlette's CORSMiddleware plus an @app.middleware("http") function
+(BaseHTTPMiddleware) that re-applies the CORS headers. Both apps are driven
+in-process over raw ASGI calls, so only the application and middleware cost
+is measured. A session built from a synthetic manifest is placed in CACHE
+directly, without PDF extraction.
+
+Usage (from the repository root):
+
+    python -m api.bench.cors_throughput --requests 2000 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+
+from api import main as api_main
+from api.bench.synthetic import manifest_pages, page_texts
+
+
+def build_legacy_app():
+    legacy = FastAPI()
+    legacy.include_router(api_main.app.router)
+    legacy.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["*"],
+        max_age=3600,
+    )
+
+    @legacy.middleware("http")
+    async def add_cors_headers(request: Request, call_next):
+        if request.method == "OPTIONS":
+            return Response(status_code=200, headers={"Access-Control-Allow-Origin": "*"})
+        try:
+            response = await call_next(request)
+            response.headers["Access-Control-Allow-Origin"] = "*"
+            return response
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"detail": f"Server error: {str(e)}"})
+
+    return legacy
+
+
+async def asgi_request(app, method, path, body=b"", content_type=None):
+    """Send one request through an ASGI app and return the response status."""
+    headers = [(b"host", b"bench"), (b"origin", b"http://bench.local")]
+    if content_type:
+        headers.append((b"content-type", content_type.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    body_sent = False
+    never = asyncio.Event()
+    status = None
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await never.wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, bodies, concurrency):
+    queue = list(bodies)
+    statuses = []
+
+    async def worker():
+        while queue:
+            body = queue.pop()
+            statuses.append(await asgi_request(app, "POST", "/api/search", body, "application/x-www-form-urlencoded"))
+
+    t = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t
+    errors = sum(1 for s in statuses if s != 200)
+    return len(statuses) / elapsed, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--manifest-pages", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    page_lines, bookings = manifest_pages(args.manifest_pages)
+    pages = page_texts(page_lines)
+    session_id = "bench-session"
+    api_main.CACHE[session_id] = api_main.new_session([api_main.build_document("bench.pdf", pages)])
+    rng = random.Random(0)
+    bodies = [urlencode({"booking": rng.choice(bookings), "sessionId": session_id}).encode()
+              for _ in range(args.requests)]
+
+    apps = {"legacy": build_legacy_app(), "asgi": api_main.app}
+    best = {}
+    # Route logging is print()-based; silence it so it does not dominate the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.rounds):
+            for name, app in apps.items():
+                rps, errors = asyncio.run(measure(app, bodies, args.concurrency))
+                if errors:
+                    raise RuntimeError(f"{name}: {errors} non-200 responses")
+                best[name] = max(best.get(name, 0), rps)
+
+    for name, rps in best.items():
+        print(f"{name:<7} {rps:>9.1f} req/s  (best of {args.rounds}, {args.requests} requests, concurrency {args.concurrency})")
+    print(f"speedup {best['asgi'] / best['legacy']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
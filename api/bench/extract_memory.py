@@ -0,0 +1,76 @@
+"""Peak-memory benchmark for extract_all_pages.
+
+Generates synthetic manifests (see api/bench/synthetic.py) and extracts each
+one in a fresh interpreter, reporting peak RSS and wall time per page count
+and mode. Low-memory mode should stay flat from 100 to 2000 pages; the
+full-cache mode grows with page count and is only run up to
+--full-max-pages.
+
+Usage (from the repository root):
+
+    python -m api.bench.extract_memory --pages 100 500 1000 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from api.bench.synthetic import write_manifest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_CHILD = """
+import json, resource, sys, time
+from api.main import extract_all_pages
+t = time.perf_counter()
+pages = extract_all_pages(sys.argv[1], low_memory=sys.argv[2] == "low")
+print(json.dumps({
+    "pages": len(pages),
+    "seconds": time.perf_counter() - t,
+    "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def run_once(path, mode):
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD, path, mode],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 1000, 2000])
+    parser.add_argument("--full-max-pages", type=int, default=200,
+                        help="largest page count to run with page caches kept (grows quickly)")
+    parser.add_argument("--workdir", default=None, help="where to keep generated manifests")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="manifest-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    print(f"{'pages':>6} {'mode':>5} {'peak MB':>8} {'seconds':>8} {'pages/s':>8}")
+    for n in args.pages:
+        path = os.path.join(workdir, f"manifest-{n}.pdf")
+        if not os.path.exists(path):
+            write_manifest(path, n)
+        modes = ["low"] + (["full"] if n <= args.full_max_pages else [])
+        for mode in modes:
+            r = run_once(path, mode)
+            results.append((n, mode, r))
+            print(f"{n:>6} {mode:>5} {r['peak_mb']:>8.1f} {r['seconds']:>8.2f} {r['pages'] / r['seconds']:>8.1f}")
+
+    low = [r["peak_mb"] for _, mode, r in results if mode == "low"]
+    if len(low) > 1:
+        print(f"low-memory peak growth: {low[-1] / low[0]:.2f}x from {args.pages[0]} to {args.pages[-1]} pages")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Import-time benchmark for the API process.
+
+Runs ``python -X importtime -c "import api.main"`` in a fresh interpreter and
+reports the cumulative import time of ``api.main`` together with the slowest
+modules. Exits non-zero when the total exceeds ``--budget-ms`` or when one of
+the lazily-imported extraction modules is pulled in at import time.
+
+Usage (from the repository root):
+
+    python -m api.bench.importtime --budget-ms 600
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules that must only be imported on the first extraction.
+LAZY_MODULES = ("pdfplumber", "pdfminer", "PIL", "pypdfium2")
+
+
+def measure(module="api.main"):
+    """Return a list of (module, self_us, cumulative_us) rows for one import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line.split(":", 1)[1].split("|")
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="api.main")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when the import exceeds this")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules to print")
+    args = parser.parse_args(argv)
+
+    rows = measure(args.module)
+    total_us = next((cum for name, _, cum in rows if name == args.module), 0)
+    print(f"{args.module}: {total_us / 1000:.1f} ms cumulative")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {cum_us / 1000:8.1f} ms  {self_us / 1000:8.1f} ms self  {name}")
+
+    failed = False
+    eager = sorted({name for name, _, _ in rows if name.split(".")[0] in LAZY_MODULES})
+    if eager:
+        print(f"❌ Imported eagerly: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"❌ Import time {total_us / 1000:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Concurrent load generator for the upload/search workflow.
+
+Starts a local uvicorn instance (or targets --url), uploads a few synthetic
+manifests to create live sessions, then runs concurrent "agents" that mostly
+search bookings across those sessions and occasionally upload a new
+manifest. Reports throughput and p50/p95/p99 latency per endpoint.
+
+With --ramp the run is repeated at increasing concurrency and the
+saturation point is reported: the first level where throughput stops
+growing by at least --min-gain, or where search p95 exceeds --slo-ms.
+
+Sessions live in the server process's in-memory cache, so the local server
+always runs a single uvicorn worker; with several workers most searches
+would land on a worker that does not hold the session. Stages with failed
+requests are flagged, left out of the saturation search, and make the run
+exit non-zero.
+
+Usage (from the repository root):
+
+    python -m api.bench.loadtest --concurrency 40 --duration 30
+    python -m api.bench.loadtest --ramp 5 10 20 40 80 --duration 15 --slo-ms 500
+"""
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from api.bench.synthetic import manifest_bytes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    """Start a single-worker uvicorn serving api.main:app and wait until /health answers."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return proc, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 30s")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+class Workload:
+    """Synthetic manifests plus the live sessions created from them."""
+
+    def __init__(self, url, manifests):
+        self.url = url
+        self.manifests = manifests  # [(pdf_bytes, bookings), ...]
+        self.sessions = []  # [(session_id, bookings), ...]
+        self.lock = threading.Lock()
+
+    def upload(self, http, rng):
+        pdf, bookings = rng.choice(self.manifests)
+        resp = http.post(f"{self.url}/api/upload", files={"file": ("manifest.pdf", pdf, "application/pdf")}, timeout=120)
+        if resp.ok:
+            with self.lock:
+                self.sessions.append((resp.json()["sessionId"], bookings))
+        return resp.status_code
+
+    def search(self, http, rng):
+        with self.lock:
+            session_id, bookings = rng.choice(self.sessions)
+        resp = http.post(f"{self.url}/api/search", data={"booking": rng.choice(bookings), "sessionId": session_id}, timeout=60)
+        return resp.status_code
+
+
+def run_stage(workload, concurrency, duration, upload_ratio, seed=0):
+    """Run `concurrency` agents for `duration` seconds; return per-endpoint stats."""
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    stop_at = time.perf_counter() + duration
+
+    def agent(n):
+        rng = random.Random(seed * 1000 + n)
+        http = requests.Session()
+        local = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.perf_counter() < stop_at:
+            endpoint = "upload" if rng.random() < upload_ratio else "search"
+            t = time.perf_counter()
+            try:
+                status = getattr(workload, endpoint)(http, rng)
+            except requests.RequestException:
+                status = None
+            local[endpoint].append(time.perf_counter() - t)
+            if status != 200:
+                local_errors[endpoint] += 1
+        with workload.lock:
+            for k, v in local.items():
+                samples[k].extend(v)
+            for k, v in local_errors.items():
+                errors[k] += v
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=agent, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    stats = {}
+    for endpoint, values in samples.items():
+        values.sort()
+        stats[endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    total = sum(len(v) for v in samples.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        "rps": total / elapsed,
+        "errors": sum(errors.values()),
+        "endpoints": stats,
+    }
+
+
+def print_stage(stage):
+    print(f"concurrency={stage['concurrency']}  total {stage['rps']:.1f} req/s over {stage['seconds']:.1f}s")
+    for endpoint, s in sorted(stage["endpoints"].items()):
+        print(f"  {endpoint:<7} {s['requests']:>6} req  {s['errors']:>4} err  {s['rps']:>8.1f} req/s  "
+              f"p50 {s['p50_ms']:>7.1f} ms  p95 {s['p95_ms']:>7.1f} ms  p99 {s['p99_ms']:>7.1f} ms")
+    if stage["errors"]:
+        print(f"  ⚠️ {stage['errors']} failed request(s): throughput and latency above are not valid")
+
+
+def find_saturation(stages, min_gain, slo_ms):
+    """Return the highest concurrency level before throughput flattens or the SLO breaks.
+
+    Stages with failed requests are skipped; throughput is compared between
+    consecutive error-free stages. The level is None when throughput was
+    still growing at the last stage, since the real limit lies beyond the ramp.
+    """
+    valid = [stage for stage in stages if not stage["errors"]]
+    skipped = [stage["concurrency"] for stage in stages if stage["errors"]]
+    if not valid:
+        return None, "every stage had failed requests"
+    note = f" (skipped concurrency {', '.join(map(str, skipped))}: errors)" if skipped else ""
+    best, reason = _saturation(valid, min_gain, slo_ms)
+    return best, reason + note
+
+
+def _saturation(stages, min_gain, slo_ms):
+    best = None
+    for prev, cur in zip([None] + stages[:-1], stages):
+        search = cur["endpoints"].get("search", {})
+        if slo_ms is not None and search.get("p95_ms", 0) > slo_ms:
+            return best, f"search p95 {search['p95_ms']:.0f} ms > {slo_ms:.0f} ms at concurrency {cur['concurrency']}"
+        if prev is not None and cur["rps"] < prev["rps"] * (1 + min_gain):
+            return prev["concurrency"], f"throughput gained < {min_gain:.0%} going to concurrency {cur['concurrency']}"
+        best = cur["concurrency"]
+    return None, f"not reached within the ramp (up to concurrency {best})"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target an already running server instead of starting uvicorn")
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--ramp", type=int, nargs="+", help="concurrency levels to step through")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per stage")
+    parser.add_argument("--upload-ratio", type=float, default=0.02, help="share of requests that are uploads")
+    parser.add_argument("--sessions", type=int, default=4, help="sessions created before the run")
+    parser.add_argument("--manifests", type=int, default=4, help="distinct synthetic manifests")
+    parser.add_argument("--manifest-pages", type=int, default=8)
+    parser.add_argument("--min-gain", type=float, default=0.05)
+    parser.add_argument("--slo-ms", type=float, default=None, help="search p95 latency objective")
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    print(f"Generating {args.manifests} manifests of {args.manifest_pages} pages...")
+    manifests = [manifest_bytes(args.manifest_pages, seed=i) for i in range(args.manifests)]
+
+    proc = None
+    url = args.url
+    if not url:
+        proc, url = start_server(_free_port())
+        print(f"Started uvicorn at {url}")
+    try:
+        workload = Workload(url, manifests)
+        http = requests.Session()
+        rng = random.Random(0)
+        for _ in range(args.sessions):
+            if workload.upload(http, rng) != 200:
+                raise RuntimeError("seed upload failed")
+        print(f"Seeded {len(workload.sessions)} sessions")
+
+        stages = []
+        for i, level in enumerate(args.ramp or [args.concurrency]):
+            stage = run_stage(workload, level, args.duration, args.upload_ratio, seed=i)
+            stages.append(stage)
+            print_stage(stage)
+
+        result = {"url": url, "stages": stages}
+        if args.ramp:
+            level, reason = find_saturation(stages, args.min_gain, args.slo_ms)
+            result["saturation"] = {"concurrency": level, "reason": reason}
+            if level is None:
+                print(f"Saturation point: none ({reason})")
+            else:
+                print(f"Saturation point: concurrency={level} ({reason})")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(result, f, indent=2)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+    failed = sum(stage["errors"] for stage in stages)
+    if failed:
+        print(f"❌ {failed} request(s) failed; results are not valid")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Synthetic tour-operator manifests for benchmarks and load tests.
+
+The layout mirrors what parse_booking expects: each flight block starts with
+a page naming the airline, flight number and arrival/departure times, and is
+followed by pages of booking lines laid out in table columns, which
+extract_text() renders as
+
+    1234567 1 Mr Anna Novak 14-03-85 * KATATHANI RESORT DLX 12-11-26 19-11-26 OK
+
+Requires reportlab (see api/requirements-test.txt).
+"""
+import random
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+AIRLINES = ["NEOS AIR", "PLL LOT", "SMARTWINGS"]
+HOTELS = [
+    "KATATHANI RESORT", "SOFITEL KRABI PHOKEETHRA", "DUSIT THANI KRABI", "CHA-DA BEACH RESORT",
+    "DEEVANA PLAZA PHUKET", "KANTARY BEACH HOTEL", "MAIKHAO DREAM VILLA", "THE SANDS KHAOLAK",
+]
+FIRST_NAMES = ["Anna", "Jan", "Petra", "Marco", "Giulia", "Tomas", "Eva", "Luca", "Marta", "Pavel"]
+LAST_NAMES = ["Novak", "Rossi", "Kowalski", "Dvorak", "Bianchi", "Nowak", "Svoboda", "Ricci"]
+TITLES = ["Mr", "Mrs", "Ms"]
+STATUSES = ["OK", "OK", "OK", "RQ", "OP"]
+
+LINES_PER_PAGE = 48
+PAGES_PER_FLIGHT = 10
+# x positions (pt) of the booking table columns
+COLUMNS = [20, 62, 78, 200, 245, 400, 440, 482]
+
+
+def _flight_page(rng, flight_no):
+    airline = rng.choice(AIRLINES)
+    return [
+        f"{airline} MANIFEST",
+        f"Flight number {flight_no}",
+        f"Arrival time {rng.randint(0, 23):02d}:{rng.choice(['00', '15', '30', '45'])}",
+        f"Departure time {rng.randint(0, 23):02d}:{rng.choice(['05', '20', '35', '50'])}",
+        ["Booking", "Pax", "Name", "Birth", "Service / Room", "From", "To", "Status"],
+    ]
+
+
+def _booking_lines(rng, booking_no):
+    hotel = rng.choice(HOTELS)
+    start = rng.randint(1, 20)
+    status = rng.choice(STATUSES)
+    lines = []
+    for pax in range(1, rng.randint(1, 4) + 1):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if pax > 1 and rng.random() < 0.15:
+            title = "Chd"
+            birth = f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(14, 22):02d}"
+        else:
+            title = rng.choice(TITLES)
+            birth = f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(50, 99):02d}"
+        lines.append([
+            booking_no, str(pax), f"{title} {name}", birth, f"* {hotel} DLX",
+            f"{start:02d}-11-26", f"{start + 7:02d}-11-26", status,
+        ])
+    return lines
+
+
+def manifest_pages(num_pages, seed=0):
+    """Return (pages, bookings): per-page lists of lines and the booking numbers used.
+
+    A line is either a string or a list of table cells (see COLUMNS).
+    """
+    rng = random.Random(seed)
+    pages = []
+    bookings = []
+    next_booking = 1000000 + rng.randint(0, 100000)
+    current = []
+    while len(pages) < num_pages:
+        if len(pages) % PAGES_PER_FLIGHT == 0 and not current:
+            pages.append(_flight_page(rng, rng.randint(100, 9999)))
+            continue
+        booking_no = str(next_booking)
+        next_booking += rng.randint(1, 50)
+        lines = _booking_lines(rng, booking_no)
+        if len(current) + len(lines) > LINES_PER_PAGE:
+            pages.append(current)
+            current = []
+            if len(pages) >= num_pages:
+                break
+            continue
+        current.extend(lines)
+        bookings.append(booking_no)
+    # Only keep bookings that made it onto a written page
+    written = {line[0] for page in pages for line in page if isinstance(line, list)}
+    return pages, [b for b in bookings if b in written]
+
+
+def write_manifest(path, num_pages, seed=0):
+    """Write a synthetic manifest PDF to `path` and return its booking numbers."""
+    pages, bookings = manifest_pages(num_pages, seed=seed)
+    c = canvas.Canvas(path, pagesize=A4)
+    for lines in pages:
+        c.setFont("Helvetica", 8)
+        y = 810
+        for line in lines:
+            if isinstance(line, list):
+                for x, cell in zip(COLUMNS, line):
+                    c.drawString(x, y, cell)
+            else:
+                c.drawString(COLUMNS[0], y, line)
+            y -= 16
+        c.showPage()
+    c.save()
+    return bookings
+
+
+def page_texts(pages):
+    """Render manifest_pages() output as [(page_number, text), ...] like extract_all_pages."""
+    return [
+        (i + 1, "\n".join(" ".join(line) if isinstance(line, list) else line for line in lines))
+        for i, lines in enumerate(pages)
+    ]
+
+
+def manifest_bytes(num_pages, seed=0):
+    """Return a synthetic manifest as PDF bytes together with its booking numbers."""
+    import io
+    bio = io.BytesIO()
+    bookings = write_manifest(bio, num_pages, seed=seed)
+    return bio.getvalue(), bookings
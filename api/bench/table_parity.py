@@ -0,0 +1,138 @@
+"""Parity report: table engine vs regex engine on a corpus of manifests.
+
+Extracts every PDF once (text plus word rows), detects the column layout,
+then parses every booking with both parse_booking and parse_booking_table.
+Reports the detected layout, exact-match rate, per-field agreement, the
+per-booking parse time of each engine and sample mismatches.
+
+Usage (from the repository root):
+
+    python -m api.bench.table_parity archive/2026-10/ --json parity.json
+    python -m api.bench.table_parity --synthetic 40
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from api.batch import collect_inputs
+from api.bench.synthetic import write_manifest
+from api.main import (
+    PARITY_FIELDS,
+    build_booking_index,
+    build_page_airlines,
+    build_table,
+    diff_results,
+    extract_all_pages,
+    jsonable_result,
+    parse_booking,
+    parse_booking_table,
+)
+
+
+def compare_file(path, max_samples=5):
+    rows = {}
+    pages = extract_all_pages(path, rows=rows)
+    index = build_booking_index(pages)
+    airlines = build_page_airlines(pages)
+    t = time.perf_counter()
+    table = build_table(rows)
+    table_build = time.perf_counter() - t
+
+    report = {
+        "path": path,
+        "pages": len(pages),
+        "layout": table["layout"] if table else None,
+        "table_build_ms": table_build * 1000,
+        "bookings": 0,
+        "exact": 0,
+        "field_mismatches": Counter(),
+        "regex_seconds": 0.0,
+        "table_seconds": 0.0,
+        "samples": [],
+    }
+    if not table:
+        return report
+
+    for booking in sorted(set(index) | set(table["index"])):
+        t = time.perf_counter()
+        expected = parse_booking(pages, booking, pre_matched_pages=index.get(booking), page_airlines=airlines)
+        report["regex_seconds"] += time.perf_counter() - t
+        t = time.perf_counter()
+        actual = parse_booking_table(pages, booking, table, page_airlines=airlines)
+        report["table_seconds"] += time.perf_counter() - t
+
+        report["bookings"] += 1
+        fields = diff_results(expected, actual)
+        if not fields:
+            report["exact"] += 1
+            continue
+        report["field_mismatches"].update(fields)
+        if len(report["samples"]) < max_samples:
+            exp = jsonable_result(expected) if expected else {}
+            act = jsonable_result(actual) if actual else {}
+            report["samples"].append({
+                "booking": booking,
+                "fields": {f: {"regex": exp.get(f), "table": act.get(f)} for f in fields},
+            })
+    return report
+
+
+def print_report(r):
+    print(f"\n{os.path.relpath(r['path'])}: {r['pages']} pages")
+    if not r["layout"]:
+        print("  no table layout detected")
+        return
+    cols = ", ".join(f"{role}@{x}" for x, role in zip(r["layout"]["columns"], r["layout"]["roles"]))
+    print(f"  layout: {cols} (built in {r['table_build_ms']:.1f} ms)")
+    n = r["bookings"] or 1
+    print(f"  bookings: {r['bookings']}  exact match: {r['exact']} ({r['exact'] / n:.1%})")
+    for field in PARITY_FIELDS:
+        bad = r["field_mismatches"].get(field, 0)
+        if bad:
+            print(f"    {field:<20} {1 - bad / n:.1%} agree ({bad} differ)")
+    regex_ms = r["regex_seconds"] * 1000 / n
+    table_ms = r["table_seconds"] * 1000 / n
+    print(f"  per booking: regex {regex_ms:.3f} ms, table {table_ms:.3f} ms "
+          f"({regex_ms / table_ms if table_ms else float('inf'):.1f}x)")
+    for sample in r["samples"]:
+        print(f"  mismatch {sample['booking']}: {json.dumps(sample['fields'], ensure_ascii=False)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="*", help="PDF files, directories or glob patterns")
+    parser.add_argument("--synthetic", type=int, default=None, help="also test a synthetic manifest of N pages")
+    parser.add_argument("--samples", type=int, default=5, help="mismatches to show per file")
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.inputs) if args.inputs else []
+    if args.synthetic:
+        path = os.path.join(tempfile.mkdtemp(prefix="parity-"), f"synthetic-{args.synthetic}.pdf")
+        write_manifest(path, args.synthetic)
+        paths.append(path)
+    if not paths:
+        parser.error("no input PDFs (pass paths or --synthetic N)")
+
+    reports = [compare_file(path, args.samples) for path in paths]
+    for r in reports:
+        print_report(r)
+
+    total = sum(r["bookings"] for r in reports)
+    exact = sum(r["exact"] for r in reports)
+    regex_s = sum(r["regex_seconds"] for r in reports)
+    table_s = sum(r["table_seconds"] for r in reports)
+    print(f"\nOverall: {exact}/{total} bookings identical ({exact / (total or 1):.1%}), "
+          f"parse speedup {regex_s / table_s if table_s else float('inf'):.1f}x")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
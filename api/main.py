@@ -1,64 +1,186 @@
 # app/main.py
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
-from fastapi.responses import JSONResponse, Response
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import BackgroundTasks, FastAPI, File, UploadFile, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
 import os, tempfile, shutil
-import pdfplumber
+import asyncio
+import cProfile
+import csv
+import gc
+import io
+import json
+import marshal
+import pstats
+import random
+import threading
+import time
+import traceback
 import re
 from datetime import datetime, date
+from functools import lru_cache
+from collections import Counter, OrderedDict, deque
 from typing import List, Optional
 from uuid import uuid4
 
-app = FastAPI()
+# pdfplumber (and the pdfminer/Pillow tree behind it) is imported lazily by
+# _pdfplumber() so cold starts only pay for it on the first extraction.
+_PDFPLUMBER = None
+_PDFPLUMBER_LOCK = threading.Lock()
+PREWARM_EXTRACTION = os.environ.get("PREWARM_EXTRACTION", "1") != "0"
 
-# ============================================
-# CORS Configuration
-# ============================================
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-    max_age=3600,
-)
 
-# ============================================
-# Middleware
-# ============================================
-@app.middleware("http")
-async def add_cors_headers(request: Request, call_next):
-    if request.method == "OPTIONS":
-        return Response(
-            status_code=200,
-            headers={
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                "Access-Control-Allow-Headers": "*",
-                "Access-Control-Max-Age": "3600",
-            }
-        )
-    
+def _pdfplumber():
+    global _PDFPLUMBER
+    if _PDFPLUMBER is None:
+        with _PDFPLUMBER_LOCK:
+            if _PDFPLUMBER is None:
+                import pdfplumber
+                _PDFPLUMBER = pdfplumber
+    return _PDFPLUMBER
+
+
+def _prewarm_extraction():
     try:
-        response = await call_next(request)
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        return response
+        _pdfplumber()
+        print("🔥 Extraction path pre-warmed")
     except Exception as e:
-        print(f"❌ Middleware error: {str(e)}")
-        print(traceback.format_exc())
-        return JSONResponse(
-            status_code=500,
-            content={"detail": f"Server error: {str(e)}"},
-            headers={"Access-Control-Allow-Origin": "*"}
-        )
+        print(f"⚠️ Pre-warm failed: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Import the extraction stack in the background once the server is
+    # accepting requests, so the first upload does not pay for it either.
+    if PREWARM_EXTRACTION:
+        threading.Thread(target=_prewarm_extraction, name="prewarm-extraction", daemon=True).start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+# ============================================
+# CORS and error handling
+# ============================================
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", b"*"),
+]
+CORS_PREFLIGHT_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, PUT, DELETE, OPTIONS"),
+    (b"access-control-allow-headers", b"*"),
+    (b"access-control-max-age", b"3600"),
+    (b"content-length", b"0"),
+]
+
+
+class CORSErrorMiddleware:
+    """Pure ASGI middleware for CORS and unhandled errors.
+
+    Answers every OPTIONS request as a preflight, appends the CORS headers to
+    the http.response.start message of every other response, and turns
+    unhandled exceptions into a JSON 500. Response bodies are passed through
+    untouched, so streaming responses are not buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        if scope["method"] == "OPTIONS":
+            await send({"type": "http.response.start", "status": 200, "headers": CORS_PREFLIGHT_HEADERS})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        
+        response_started = False
+        
+        async def send_with_cors(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                message = {**message, "headers": list(message.get("headers", [])) + CORS_HEADERS}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_cors)
+        except Exception as e:
+            print(f"❌ Middleware error: {str(e)}")
+            print(traceback.format_exc())
+            if response_started:
+                raise
+            body = json.dumps({"detail": f"Server error: {str(e)}"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ] + CORS_HEADERS,
+            })
+            await send({"type": "http.response.body", "body": body})
+
+
+app.add_middleware(CORSErrorMiddleware)
+
 # -------------------
 # Parsing helpers (adapted from your provided code)
 # -------------------
-def _parse_date_str(dstr):
-    if not dstr or not isinstance(dstr, str):
+DATE_FORMATS = ("%y-%m-%d", "%Y-%m-%d", "%d-%m-%y", "%d-%m-%Y")
+# Manifests repeat the same few service and birth dates thousands of times
+DATE_CACHE_SIZE = int(os.environ.get("DATE_CACHE_SIZE", "4096"))
+
+
+def _is_ascii_digits(s):
+    return s.isascii() and s.isdigit()
+
+
+def _two_digit_year(yy):
+    # Same pivot as strptime's %y
+    return yy + (1900 if yy >= 69 else 2000)
+
+
+def _fast_parse_date(dstr):
+    """Fixed-width parse of dd-dd-dd, dddd-dd-dd and dd-dd-dddd tokens.
+
+    Tries the layouts in DATE_FORMATS order, so "12-11-26" is 2012-11-26 when
+    that is a valid date, exactly like the strptime loop. Returns False when
+    the token is not one of these layouts.
+    """
+    n = len(dstr)
+    if n == 8 and dstr[2] == "-" and dstr[5] == "-":
+        a, b, c = dstr[0:2], dstr[3:5], dstr[6:8]
+        if not _is_ascii_digits(a + b + c):
+            return False
+        for y, m, d in ((_two_digit_year(int(a)), int(b), int(c)), (_two_digit_year(int(c)), int(b), int(a))):
+            try:
+                return date(y, m, d)
+            except ValueError:
+                continue
+        return None
+    if n == 10 and dstr[4] == "-" and dstr[7] == "-":
+        y, m, d = dstr[0:4], dstr[5:7], dstr[8:10]
+    elif n == 10 and dstr[2] == "-" and dstr[5] == "-":
+        d, m, y = dstr[0:2], dstr[3:5], dstr[6:10]
+    else:
+        return False
+    if not _is_ascii_digits(y + m + d):
+        return False
+    try:
+        return date(int(y), int(m), int(d))
+    except ValueError:
         return None
-    for fmt in ("%y-%m-%d", "%Y-%m-%d", "%d-%m-%y", "%d-%m-%Y"):
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date_token(dstr):
+    d = _fast_parse_date(dstr)
+    if d is not False:
+        return d
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(dstr, fmt).date()
         except ValueError:
@@ -66,11 +188,23 @@ def _parse_date_str(dstr):
     return None
 
 
-def format_age_suffix(birth_str):
-    d = _parse_date_str(birth_str)
+def _parse_date_str(dstr):
+    if not dstr or not isinstance(dstr, str):
+        return None
+    return _parse_date_token(dstr)
+
+
+def format_age_suffix(birth_str, today=None):
+    if not birth_str or not isinstance(birth_str, str):
+        return None
+    return _age_suffix(birth_str, today or date.today())
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _age_suffix(birth_str, today):
+    d = _parse_date_token(birth_str)
     if not d:
         return None
-    today = date.today()
     years = today.year - d.year - ((today.month, today.day) < (d.month, d.day))
     if years >= 1:
         return f"{years}YO"
@@ -80,14 +214,98 @@ def format_age_suffix(birth_str):
     return f"{months}Month"
 
 
-def extract_all_pages(path):
+# -------------------
+# Extraction limits
+# -------------------
+MAX_UPLOAD_MB = float(os.environ.get("MAX_UPLOAD_MB", "15"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+EXTRACT_TIMEOUT_SECONDS = float(os.environ.get("EXTRACT_TIMEOUT_SECONDS", "45"))
+# Release each page's layout caches as soon as its text is taken.
+EXTRACT_LOW_MEMORY = os.environ.get("EXTRACT_LOW_MEMORY", "1") != "0"
+# Optional budget (MB) for RSS growth during one extraction; unset means no limit.
+EXTRACT_MEMORY_BUDGET_MB = float(os.environ["EXTRACT_MEMORY_BUDGET_MB"]) if os.environ.get("EXTRACT_MEMORY_BUDGET_MB") else None
+
+
+class ExtractionMemoryError(MemoryError):
+    """Raised when extraction's RSS growth stays above the budget after flushing caches."""
+
+
+def _current_rss_mb():
+    """Resident set size of this process in MB, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def extract_all_pages(path, low_memory=None, memory_budget_mb=None, rows=None):
+    """Return [(page_number, text), ...] for every page of the PDF at `path`.
+
+    In low-memory mode (the default, see EXTRACT_LOW_MEMORY) each page is
+    closed right after extract_text(), so pdfplumber's per-page layout and
+    character caches do not accumulate and peak memory stays flat as the page
+    count grows. With a memory budget, RSS is checked after every page against
+    its value when extraction started, so cached sessions and memory the
+    process already holds do not count; growing past the budget flushes the
+    document caches and runs the GC, and if that is not enough
+    ExtractionMemoryError is raised. RSS is process-wide, so extractions
+    running at the same time still add to each other's growth.
+
+    When `rows` is a dict it is filled with page_number -> booking rows (word
+    positions, see extract_page_rows) for the table engine, reusing the
+    layout computed for the text.
+    """
+    if low_memory is None:
+        low_memory = EXTRACT_LOW_MEMORY
+    if memory_budget_mb is None:
+        memory_budget_mb = EXTRACT_MEMORY_BUDGET_MB
     pages = []
-    with pdfplumber.open(path) as pdf:
+    start_rss = _current_rss_mb() if memory_budget_mb else None
+    with _pdfplumber().open(path) as pdf:
         for i, page in enumerate(pdf.pages):
             pages.append((i + 1, page.extract_text()))
+            if rows is not None:
+                rows[i + 1] = extract_page_rows(page)
+            if low_memory:
+                page.close()
+            if start_rss is not None:
+                rss = _current_rss_mb()
+                if rss is not None and rss - start_rss > memory_budget_mb:
+                    pdf.flush_cache()
+                    gc.collect()
+                    rss = _current_rss_mb()
+                    if rss is not None and rss - start_rss > memory_budget_mb:
+                        raise ExtractionMemoryError(
+                            f"Extraction grew RSS by {rss - start_rss:.0f} MB after page {i + 1} "
+                            f"(budget {memory_budget_mb:.0f} MB)"
+                        )
     return pages
 
 
+async def save_upload(file, dest, max_mb=None):
+    """Copy an UploadFile to `dest` in chunks and return its size in bytes.
+
+    Starlette has already spooled the whole multipart body (to disk past
+    1 MB) before the handler runs, so this does not limit what the client
+    sends. It keeps the copy out of memory and raises HTTPException(400)
+    once the file exceeds max_mb, before it is parsed.
+    """
+    max_mb = MAX_UPLOAD_MB if max_mb is None else max_mb
+    max_bytes = max_mb * 1024 * 1024
+    size = 0
+    with open(dest, "wb") as f:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=400, detail=f"File too large (max {max_mb:g}MB)")
+            f.write(chunk)
+    return size
+
+
 def extract_flight_number(line):
     m = re.search(r"\b(\d{3,5})\b", line)
     return m.group(1) if m else None
@@ -209,52 +427,261 @@ def format_flight_number(flight_number, user_prefix=None):
     return flight_number
 
 
+# -------------------
+# Airline rules
+# -------------------
+# Checked in order: when several airlines are mentioned on a page the earliest
+# rule wins. Flight numbers are formatted as prefix + digits, zero-padded to
+# `pad` digits when pad > 0. Override with a JSON list in AIRLINE_RULES_FILE.
+AIRLINE_RULES = [
+    {"name": "LOT", "markers": ["PLL LOT", "LOT"], "prefix": "LOT", "pad": 0},
+    # Only match NEOS/NEOS AIR explicitly (do not infer from the 'NO' token)
+    {"name": "Neos Air", "markers": ["NEOS AIR", "NEOS"], "prefix": "NO", "pad": 4},
+]
+
+
+def _load_airline_rules():
+    path = os.environ.get("AIRLINE_RULES_FILE")
+    if not path:
+        return AIRLINE_RULES
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    for rule in rules:
+        if not rule.get("name") or not rule.get("markers"):
+            raise ValueError(f"Airline rule needs a name and markers: {rule!r}")
+        rule.setdefault("prefix", rule["name"])
+        rule.setdefault("pad", 0)
+    return rules
+
+
+def _compile_airline_matcher(rules):
+    """Compile every rule's markers into one case-insensitive alternation.
+
+    Each rule gets its own named group, so a single pass over the page text
+    reports which rules matched.
+    """
+    groups = []
+    for i, rule in enumerate(rules):
+        markers = sorted(rule["markers"], key=len, reverse=True)
+        alts = "|".join(r"\s+".join(re.escape(w) for w in m.split()) for m in markers)
+        groups.append(f"(?P<r{i}>{alts})")
+    return re.compile(r"\b(?:%s)\b" % "|".join(groups), re.I)
+
+
+_AIRLINE_RULES = _load_airline_rules()
+_AIRLINE_RULES_BY_NAME = {rule["name"]: rule for rule in _AIRLINE_RULES}
+_AIRLINE_MATCHER = _compile_airline_matcher(_AIRLINE_RULES)
+
+
 def _detect_airline_on_text(text: Optional[str]):
     """Detect airline from page text. Returns a normalized airline name or None.
 
-    Detection rules (simple heuristics):
-    - If page contains 'PLL LOT' or 'LOT' -> 'LOT'
-    - If page contains 'NEOS' or 'NEOS AIR' -> 'Neos Air'
+    Markers come from AIRLINE_RULES; the first rule (in table order) with a
+    marker anywhere on the page wins.
     """
     if not text:
         return None
-    t = text.upper()
-    # Priority: detect LOT (PLL LOT) first
-    if re.search(r"\bPLL\s+LOT\b", t) or re.search(r"\bLOT\b", t):
-        return "LOT"
-    # Detect NEOS only when the page explicitly contains NEOS/NEOS AIR (do not infer from 'NO' token)
-    if re.search(r"\bNEOS\b", t) or re.search(r"\bNEOS\s+AIR\b", t):
-        return "Neos Air"
-    return None
+    best = None
+    for m in _AIRLINE_MATCHER.finditer(text):
+        i = int(m.lastgroup[1:])
+        if best is None or i < best:
+            best = i
+            if best == 0:
+                break
+    return _AIRLINE_RULES[best]["name"] if best is not None else None
+
+
+def build_page_airlines(pages):
+    """Map page number -> detected airline for every page that names one."""
+    airlines = {}
+    for page_num, text in pages:
+        airline = _detect_airline_on_text(text)
+        if airline:
+            airlines[page_num] = airline
+    return airlines
 
 
 def _format_by_airline(raw_flight, airline_name: Optional[str]):
-    """Format flight number according to airline rules specified by user.
+    """Format flight number according to the airline's rule.
 
-    - Neos Air -> NO + zero-padded 4 digits
-    - LOT -> LOT + digits (no padding)
+    - prefix + digits, zero-padded to the rule's `pad` width when set
+      (Neos Air -> NO0123, LOT -> LOT123)
     - Otherwise: return raw_flight unchanged
     """
     if not raw_flight:
         return None
+    rule = _AIRLINE_RULES_BY_NAME.get(airline_name)
+    if not rule:
+        return raw_flight
     s = str(raw_flight)
+    prefix = rule["prefix"]
     # extract digits
     m = re.search(r"(\d+)", s)
-    digits = m.group(1) if m else None
-    if airline_name == "Neos Air":
-        if digits:
-            try:
-                num = int(digits)
-                return f"NO{num:04d}"
-            except Exception:
-                return f"NO{digits}"
-        return f"NO{s}"
-    if airline_name == "LOT":
-        if digits:
-            return f"LOT{digits}"
-        return f"LOT{s}"
-    # default: return original
-    return raw_flight
+    if not m:
+        return f"{prefix}{s}"
+    digits = m.group(1)
+    if rule.get("pad"):
+        return f"{prefix}{int(digits):0{rule['pad']}d}"
+    return f"{prefix}{digits}"
+
+
+def _page_text(pages, page_num):
+    """Return the text of page `page_num` in O(1) for extract_all_pages output."""
+    i = page_num - 1
+    if 0 <= i < len(pages) and pages[i][0] == page_num:
+        return pages[i][1]
+    for pp, txt in pages:
+        if pp == page_num:
+            return txt
+    return None
+
+
+# -------------------
+# Hotel dictionary
+# -------------------
+HOTEL_KEYWORDS_FILE = os.environ.get(
+    "HOTEL_KEYWORDS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "hotel_keywords.txt")
+)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton for matching a keyword dictionary in one pass.
+
+    Keywords are stored upper-cased; callers pass upper-cased text. Only
+    matches that start and end on word boundaries are reported, so short
+    keywords like "LA" do not fire inside longer words.
+    """
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.keywords = []
+        seen = set()
+        for kw in keywords:
+            kw = kw.strip().upper()
+            if kw and kw not in seen:
+                seen.add(kw)
+                self.keywords.append(kw)
+                self._add(kw)
+        self._build()
+
+    def _add(self, kw):
+        state = 0
+        for ch in kw:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append(kw)
+
+    def _build(self):
+        # Breadth-first, so every fail target is resolved before it is used.
+        # Depth-1 states keep fail = 0 (the root).
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    @staticmethod
+    def _is_word_char(ch):
+        return ch.isalnum() or ch == "_"
+
+    def finditer(self, text):
+        """Yield (start, end, keyword) for every word-bounded match in text."""
+        state = 0
+        goto, fail, out = self.goto, self.fail, self.out
+        n = len(text)
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            if end < n and self._is_word_char(text[end]):
+                continue
+            for kw in out[state]:
+                start = end - len(kw)
+                if start > 0 and self._is_word_char(text[start - 1]):
+                    continue
+                yield start, end, kw
+
+    def best_match(self, text):
+        """Return the longest keyword found in text (first one on ties), or None."""
+        best = None
+        for _, _, kw in self.finditer(text):
+            if best is None or len(kw) > len(best):
+                best = kw
+        return best
+
+
+# Reporting order of keyword kinds; "weak" keywords are never reported
+HOTEL_KIND_PRIORITY = {"property": 0, "location": 1, "generic": 2}
+HOTEL_KINDS = tuple(HOTEL_KIND_PRIORITY) + ("weak",)
+
+
+def load_hotel_keywords(path=None):
+    """Read the keyword file into [(keyword, kind, strong), ...].
+
+    Keywords take the kind of the last [section] line above them (property
+    when there is none); a leading '*' marks a strong accommodation word.
+    """
+    path = path or HOTEL_KEYWORDS_FILE
+    entries = []
+    kind = "property"
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("[") and line.endswith("]"):
+                kind = line[1:-1].strip().lower()
+                if kind not in HOTEL_KINDS:
+                    raise ValueError(f"Unknown hotel keyword section [{kind}] in {path}")
+                continue
+            strong = line.startswith("*")
+            entries.append((line.lstrip("*").strip(), kind, strong))
+    return entries
+
+
+HOTEL_KEYWORDS = load_hotel_keywords()
+HOTEL_MATCHER = KeywordAutomaton(kw for kw, _, _ in HOTEL_KEYWORDS)
+# First kind wins when a keyword is listed twice
+HOTEL_KEYWORD_KIND = {kw.upper(): kind for kw, kind, _ in reversed(HOTEL_KEYWORDS)}
+# Lines with one of these are hotel lines, not untitled passenger names
+ACCOMMODATION_MATCHER = KeywordAutomaton(kw for kw, _, strong in HOTEL_KEYWORDS if strong)
+
+
+def match_hotel(text):
+    """Return (matched, hotel) for upper-cased text.
+
+    `matched` is True when any dictionary keyword occurs, weak ones included.
+    `hotel` is the best reportable keyword: a property before a location
+    before a generic word, the longest within a kind; None if only weak
+    keywords (or none) occur.
+    """
+    matched = False
+    hotel = None
+    best = None
+    for _, _, kw in HOTEL_MATCHER.finditer(text):
+        matched = True
+        rank = HOTEL_KIND_PRIORITY.get(HOTEL_KEYWORD_KIND.get(kw))
+        if rank is None:
+            continue
+        key = (rank, -len(kw))
+        if best is None or key < best:
+            best, hotel = key, kw
+    return matched, hotel
 
 
 def build_booking_index(pages, min_digits=6, max_digits=10):
@@ -269,17 +696,8 @@ def build_booking_index(pages, min_digits=6, max_digits=10):
     return idx
 
 
-def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None, pre_matched_pages=None):
-    matched_pages = []
-    if pre_matched_pages is not None:
-        matched_pages = list(pre_matched_pages)
-    else:
-        for page_num, text in pages:
-            if booking_no in (text or ""):
-                matched_pages.append((page_num, text))
-    if not matched_pages:
-        return None
-    matched_pages.sort(key=lambda x: x[0])
+def _resolve_flights(pages, matched_pages, prefix_arrival=None, prefix_departure=None, page_airlines=None):
+    """Find arrival/departure flight, time and airline for a booking's (sorted) matched pages."""
     departure_page_num, departure_text = matched_pages[0]
     arrival_page_num, arrival_text = matched_pages[-1]
     arrival_flight, arrival_time, arrival_page_num_found = find_flight_info_backward(pages, arrival_page_num - 1, info_type="arrival")
@@ -364,116 +782,24 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
             departure_flight = chosen[1]
             departure_time = chosen[2]
 
-    passenger_list = []
-    passenger_seen = set()
-    service_entries = []
-    status = None
-    dates_found = []
-
-    # allow Unicode word characters so accented names are matched (e.g., Dubská)
-    name_re = re.compile(r"\b\d+\s+(?P<name>(?:Mr|Mrs|Miss|Ms|Dr|Master|Mstr|Mx)\.?\s+[\w][\w .'\-]+?)\s+(?P<birth>\d{2}-\d{2}-\d{2})", re.I)
-    name_re_chdinf = re.compile(r"\b\d+\s+(?P<type>Chd|Inf)\b\s+(?P<name>[\w][\w .'\-]+?)\s+(?P<birth>\d{2}-\d{2}-\d{2})", re.I)
-    # fallback: names without titles (all uppercase name then birth date)
-    name_re_no_title = re.compile(r"\b\d+\s+(?P<name>[\w][\w .'\-]+?)\s+(?P<birth>\d{2}-\d{2}-\d{2})")
-
-    for page_num, text in matched_pages:
-        if not text:
-            continue
-        for line in (text or "").splitlines():
-            if booking_no not in line:
-                continue
-            m_title = name_re.search(line)
-            m_chd = name_re_chdinf.search(line)
-            birth_to_skip = None
-            if m_title:
-                name = m_title.group('name').strip()
-                birth = m_title.group('birth')
-                birth_to_skip = birth
-                # If the line contains child/infant markers, prefix the type before the name.
-                typ_m = re.search(r"\b(Chd|Inf)\b", line, re.I)
-                if typ_m:
-                    typ = typ_m.group(1)
-                    age_suf = format_age_suffix(birth)
-                    if age_suf is not None:
-                        name = f"{typ} {name} ({age_suf})"
-                if name not in passenger_seen:
-                    passenger_seen.add(name)
-                    passenger_list.append(name)
-            elif m_chd:
-                typ = m_chd.group('type')
-                name = m_chd.group('name').strip()
-                birth = m_chd.group('birth')
-                birth_to_skip = birth
-                age_suf = format_age_suffix(birth)
-                if age_suf is not None:
-                    name = f"{typ} {name} ({age_suf})"
-                else:
-                    name = f"{typ} {name}"
-                if name not in passenger_seen:
-                    passenger_seen.add(name)
-                    passenger_list.append(name)
-
-            if line.strip().upper().startswith(f"B {booking_no}"):
-                pass
-            else:
-                m_service = re.search(r"\*\s*(.*?)\s*(?:DLX|\(|$)", line)
-                if m_service:
-                    raw = m_service.group(1).strip()
-                    cleaned = re.split(r"\s+(?:[A-Z]+/[A-Z0-9]+|\d{1,2}\b|\d{2}-\d{2}-\d{2})", raw, maxsplit=1)[0].strip()
-                    if cleaned:
-                        entry = {"raw": raw, "cleaned": cleaned, "dates": [], "page": None}
-                        service_entries.append(entry)
-                else:
-                    m_service2 = re.search(r"([A-Z][A-Z0-9 ]{2,}?)\s+(?:[A-Z]+/[A-Z0-9]+|\d{1,2}\b|\d{2}-\d{2}-\d{2}|DLX|\(|$)", line)
-                    if m_service2:
-                        cand = m_service2.group(1).strip()
-                        if cand:
-                            if re.search(r"\b(Mr|Mrs|Miss|Ms|Dr|Master|Mstr|Mx)\b", line, re.I):
-                                pass
-                            else:
-                                entry = {"raw": cand, "cleaned": cand, "dates": [], "page": None}
-                                service_entries.append(entry)
-
-            m_status = re.search(r"\b(OK|OP|RQ|CNX)\b", line)
-            if m_status:
-                status = m_status.group(1)
-
-            m_dates = re.findall(r"\d{2}-\d{2}-\d{2}", line)
-            parsed_dates = []
-            for dstr in m_dates:
-                if birth_to_skip and dstr == birth_to_skip:
-                    continue
-                d = _parse_date_str(dstr)
-                if d:
-                    if 2000 <= d.year <= (date.today().year + 10):
-                        dates_found.append(d)
-                        parsed_dates.append(d)
-            # attach parsed_dates to the most recent service entry on this line (if any)
-            if parsed_dates and service_entries:
-                # prefer the last service entry appended that hasn't got a page set yet
-                for se in reversed(service_entries):
-                    if se.get('page') is None:
-                        se['dates'].extend(parsed_dates)
-                        se['page'] = page_num
-                        break
-
     arrival_flight_formatted = format_flight_number(arrival_flight, prefix_arrival)
     departure_flight_formatted = format_flight_number(departure_flight, prefix_departure)
 
-    # Detect airline on the pages where arrival/departure times were found
-    def _get_page_text_by_pnum(pnum):
-        for pp, txt in pages:
-            if pp == pnum:
-                return txt
-        return None
+    # Detect airline on the pages where arrival/departure times were found.
+    # Sessions carry a precomputed page -> airline map from upload time.
+    def _airline_on_page(pnum):
+        if pnum is None:
+            return None
+        if page_airlines is not None:
+            return page_airlines.get(pnum)
+        return _detect_airline_on_text(_page_text(pages, pnum))
 
     arrival_airline = None
     departure_airline = None
     try:
         # arrival
         apnum = arrival_page_num_found or arrival_page_num
-        atext = _get_page_text_by_pnum(apnum) if apnum is not None else None
-        arrival_airline = _detect_airline_on_text(atext)
+        arrival_airline = _airline_on_page(apnum)
         if arrival_airline:
             arrival_flight_formatted = _format_by_airline(arrival_flight_formatted or arrival_flight, arrival_airline)
     except Exception:
@@ -481,15 +807,24 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
 
     try:
         dpnum = departure_page_num_found or departure_page_num
-        dtext = _get_page_text_by_pnum(dpnum) if dpnum is not None else None
-        departure_airline = _detect_airline_on_text(dtext)
+        departure_airline = _airline_on_page(dpnum)
         if departure_airline:
             departure_flight_formatted = _format_by_airline(departure_flight_formatted or departure_flight, departure_airline)
     except Exception:
         departure_airline = None
 
-    hotel_keywords = ["HOTEL", "RESORT", "VILLA", "SOFITEL", "DUSIT", "CHA-DA", "CHA DA", "PHOKEETHRA", "THANI", "KRABI", "PHUKET", "LA", "KANTARY", "SANTHIYA", "GRACELAND", "MY", "MIDA", "LE", "MAIKHAO", "KATATHANI", "DEEVANA", "KHAOLAK", "DEEVANA", "DIAMOND", "BARCELO", "KORA", "MORACEA", "CAPE", "THE", "MANDARAVA", "VERANDA", "BEST"]
+    return {
+        "arrival": {"flight": arrival_flight_formatted, "time": arrival_time, "page": arrival_page_num_found},
+        "departure": {"flight": departure_flight_formatted, "time": departure_time, "page": departure_page_num_found},
+        "airline": {"arrival": arrival_airline, "departure": departure_airline},
+    }
+
+
+def _select_services(service_entries, passenger_list, booking_no):
+    """Clean, filter and deduplicate raw service entries.
 
+    Returns (service, hotel, service_date_ranges).
+    """
     passenger_surnames = set()
     for p in passenger_list:
         name_only = re.sub(r"\s*\(\d+YO\)$", "", p)
@@ -528,9 +863,12 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
             continue
         seen_keys.add(key)
         cleaned_name = clean_service_name(cand)
+        matched, hotel = match_hotel(cleaned_name.upper())
         cleaned_entries.append({
             'name': cleaned_name,
             'upper': cleaned_name.upper(),
+            'matched': matched,
+            'hotel': hotel,
             'dates': se.get('dates', []) or [],
             'page': se.get('page')
         })
@@ -538,8 +876,8 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
     # Filter out entries that look like passenger names
     entries_filtered = [e for e in cleaned_entries if not looks_like_passenger_name(e['upper'])]
 
-    # Prefer entries containing hotel keywords when available
-    preferred = [e for e in entries_filtered if any(k in e['upper'] for k in hotel_keywords)]
+    # Prefer entries matching the hotel dictionary when available
+    preferred = [e for e in entries_filtered if e['matched']]
     final_entries = preferred if preferred else entries_filtered if entries_filtered else cleaned_entries
 
     # Deduplicate by upper name while preserving order
@@ -557,6 +895,7 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
         final_entries_unique.append(e)
 
     service = "; ".join(final) if final else None
+    hotel = next((e['hotel'] for e in final_entries_unique if e['hotel']), None)
 
     # Build per-service date ranges (start/end) from attached dates
     service_date_ranges = []
@@ -569,38 +908,10 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
         else:
             service_date_ranges.append({'service': e['name'], 'start': None, 'end': None})
 
-    # If no passengers found, attempt a relaxed pass to capture uppercase names without titles.
-    matched_lines = []
-    if not passenger_list:
-        for page_num, text in matched_pages:
-            if not text:
-                continue
-            for line in (text or "").splitlines():
-                if booking_no not in line:
-                    continue
-                matched_lines.append((page_num, line))
-                m_relax = name_re_no_title.search(line)
-                if m_relax:
-                    # avoid catching obvious hotel/service lines by excluding hotel keywords
-                    if not re.search(r"\b(HOTEL|RESORT|VILLA|CHA-DA|SOFITEL|DUSIT|RESORT)\b", line, re.I):
-                        name = m_relax.group('name').strip()
-                        birth = m_relax.group('birth')
-                        age_suf = format_age_suffix(birth)
-                        typ_m = re.search(r"\b(Chd|Inf)\b", line, re.I)
-                        if age_suf:
-                            if typ_m:
-                                typ = typ_m.group(1)
-                                name = f"{typ} {name} ({age_suf})"
-                            else:
-                                name = f"{name} ({age_suf})"
-                        else:
-                            if typ_m:
-                                name = f"{typ_m.group(1)} {name}"
-                        if name not in passenger_seen:
-                            passenger_seen.add(name)
-                            passenger_list.append(name)
+    return service, hotel, service_date_ranges
 
 
+def _booking_result(flights, passenger_list, service, hotel, service_date_ranges, status, dates_found, matched_lines):
     start_date = None
     end_date = None
     if dates_found:
@@ -622,14 +933,15 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
     pax_summary = f"Adult = {pax_adult} PAX\nChild = {pax_child} PAX"
 
     return {
-        "arrival": {"flight": arrival_flight_formatted, "time": arrival_time, "page": arrival_page_num_found},
-        "departure": {"flight": departure_flight_formatted, "time": departure_time, "page": departure_page_num_found},
+        "arrival": flights["arrival"],
+        "departure": flights["departure"],
         "passengers": passenger_list,
         "pax_adult": pax_adult,
         "pax_child": pax_child,
         "pax_summary": pax_summary,
-        "airline": {"arrival": arrival_airline, "departure": departure_airline},
+        "airline": flights["airline"],
         "service": service,
+        "hotel": hotel,
         "service_date_ranges": service_date_ranges,
         "status": status,
         "start_date": start_date,
@@ -637,6 +949,441 @@ def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None,
         "matched_lines": matched_lines,
     }
 
+
+def parse_booking(pages, booking_no, prefix_arrival=None, prefix_departure=None, pre_matched_pages=None, page_airlines=None, today=None):
+    today = today or date.today()
+    max_year = today.year + 10
+    matched_pages = []
+    if pre_matched_pages is not None:
+        matched_pages = list(pre_matched_pages)
+    else:
+        for page_num, text in pages:
+            if booking_no in (text or ""):
+                matched_pages.append((page_num, text))
+    if not matched_pages:
+        return None
+    matched_pages.sort(key=lambda x: x[0])
+    flights = _resolve_flights(pages, matched_pages, prefix_arrival, prefix_departure, page_airlines)
+
+    passenger_list = []
+    passenger_seen = set()
+    service_entries = []
+    status = None
+    dates_found = []
+
+    # allow Unicode word characters so accented names are matched (e.g., Dubská)
+    name_re = re.compile(r"\b\d+\s+(?P<name>(?:Mr|Mrs|Miss|Ms|Dr|Master|Mstr|Mx)\.?\s+[\w][\w .'\-]+?)\s+(?P<birth>\d{2}-\d{2}-\d{2})", re.I)
+    name_re_chdinf = re.compile(r"\b\d+\s+(?P<type>Chd|Inf)\b\s+(?P<name>[\w][\w .'\-]+?)\s+(?P<birth>\d{2}-\d{2}-\d{2})", re.I)
+    # fallback: names without titles (all uppercase name then birth date)
+    name_re_no_title = re.compile(r"\b\d+\s+(?P<name>[\w][\w .'\-]+?)\s+(?P<birth>\d{2}-\d{2}-\d{2})")
+
+    for page_num, text in matched_pages:
+        if not text:
+            continue
+        for line in (text or "").splitlines():
+            if booking_no not in line:
+                continue
+            m_title = name_re.search(line)
+            m_chd = name_re_chdinf.search(line)
+            birth_to_skip = None
+            if m_title:
+                name = m_title.group('name').strip()
+                birth = m_title.group('birth')
+                birth_to_skip = birth
+                # If the line contains child/infant markers, prefix the type before the name.
+                typ_m = re.search(r"\b(Chd|Inf)\b", line, re.I)
+                if typ_m:
+                    typ = typ_m.group(1)
+                    age_suf = format_age_suffix(birth, today)
+                    if age_suf is not None:
+                        name = f"{typ} {name} ({age_suf})"
+                if name not in passenger_seen:
+                    passenger_seen.add(name)
+                    passenger_list.append(name)
+            elif m_chd:
+                typ = m_chd.group('type')
+                name = m_chd.group('name').strip()
+                birth = m_chd.group('birth')
+                birth_to_skip = birth
+                age_suf = format_age_suffix(birth, today)
+                if age_suf is not None:
+                    name = f"{typ} {name} ({age_suf})"
+                else:
+                    name = f"{typ} {name}"
+                if name not in passenger_seen:
+                    passenger_seen.add(name)
+                    passenger_list.append(name)
+
+            if line.strip().upper().startswith(f"B {booking_no}"):
+                pass
+            else:
+                m_service = re.search(r"\*\s*(.*?)\s*(?:DLX|\(|$)", line)
+                if m_service:
+                    raw = m_service.group(1).strip()
+                    cleaned = re.split(r"\s+(?:[A-Z]+/[A-Z0-9]+|\d{1,2}\b|\d{2}-\d{2}-\d{2})", raw, maxsplit=1)[0].strip()
+                    if cleaned:
+                        entry = {"raw": raw, "cleaned": cleaned, "dates": [], "page": None}
+                        service_entries.append(entry)
+                else:
+                    m_service2 = re.search(r"([A-Z][A-Z0-9 ]{2,}?)\s+(?:[A-Z]+/[A-Z0-9]+|\d{1,2}\b|\d{2}-\d{2}-\d{2}|DLX|\(|$)", line)
+                    if m_service2:
+                        cand = m_service2.group(1).strip()
+                        if cand:
+                            if re.search(r"\b(Mr|Mrs|Miss|Ms|Dr|Master|Mstr|Mx)\b", line, re.I):
+                                pass
+                            else:
+                                entry = {"raw": cand, "cleaned": cand, "dates": [], "page": None}
+                                service_entries.append(entry)
+
+            m_status = re.search(r"\b(OK|OP|RQ|CNX)\b", line)
+            if m_status:
+                status = m_status.group(1)
+
+            m_dates = re.findall(r"\d{2}-\d{2}-\d{2}", line)
+            parsed_dates = []
+            for dstr in m_dates:
+                if birth_to_skip and dstr == birth_to_skip:
+                    continue
+                d = _parse_date_str(dstr)
+                if d:
+                    if 2000 <= d.year <= max_year:
+                        dates_found.append(d)
+                        parsed_dates.append(d)
+            # attach parsed_dates to the most recent service entry on this line (if any)
+            if parsed_dates and service_entries:
+                # prefer the last service entry appended that hasn't got a page set yet
+                for se in reversed(service_entries):
+                    if se.get('page') is None:
+                        se['dates'].extend(parsed_dates)
+                        se['page'] = page_num
+                        break
+
+    service, hotel, service_date_ranges = _select_services(service_entries, passenger_list, booking_no)
+
+    # If no passengers found, attempt a relaxed pass to capture uppercase names without titles.
+    matched_lines = []
+    if not passenger_list:
+        for page_num, text in matched_pages:
+            if not text:
+                continue
+            for line in (text or "").splitlines():
+                if booking_no not in line:
+                    continue
+                matched_lines.append((page_num, line))
+                m_relax = name_re_no_title.search(line)
+                if m_relax:
+                    # avoid catching obvious hotel/service lines by excluding strong accommodation words
+                    if not ACCOMMODATION_MATCHER.best_match(line.upper()):
+                        name = m_relax.group('name').strip()
+                        birth = m_relax.group('birth')
+                        age_suf = format_age_suffix(birth, today)
+                        typ_m = re.search(r"\b(Chd|Inf)\b", line, re.I)
+                        if age_suf:
+                            if typ_m:
+                                typ = typ_m.group(1)
+                                name = f"{typ} {name} ({age_suf})"
+                            else:
+                                name = f"{name} ({age_suf})"
+                        else:
+                            if typ_m:
+                                name = f"{typ_m.group(1)} {name}"
+                        if name not in passenger_seen:
+                            passenger_seen.add(name)
+                            passenger_list.append(name)
+
+
+    return _booking_result(flights, passenger_list, service, hotel, service_date_ranges, status, dates_found, matched_lines)
+
+# -------------------
+# Table engine (coordinate-based)
+# -------------------
+# Alternative to the regex cascade in parse_booking. The manifest's column
+# layout is detected once per document from word x-positions, every booking
+# row is split into cells at upload, and parsing a booking only assembles
+# its cells. Enable with PARSE_ENGINE=table.
+PARSE_ENGINE = os.environ.get("PARSE_ENGINE", "regex")
+TABLE_ROW_TOLERANCE = 3  # pt: words whose tops differ by no more are on the same row
+TABLE_COLUMN_TOLERANCE = 3  # pt: word starts this close belong to the same column start
+TABLE_COLUMN_GAP = 4  # pt: a word only starts a cell when the gap before it is wider than this
+TABLE_COLUMN_SUPPORT = 0.6  # share of sampled rows that must start a word at a column
+TABLE_LAYOUT_SAMPLE = 500
+
+_BOOKING_TOKEN = re.compile(r"^\d{6,10}$")
+_DATE_TOKEN = re.compile(r"^\d{2}-\d{2}-\d{2}$")
+_TITLE_TOKEN = re.compile(r"^(?:Mr|Mrs|Miss|Ms|Dr|Master|Mstr|Mx)\.?$", re.I)
+_CHILD_TOKEN = re.compile(r"^(?:Chd|Inf)$", re.I)
+_STATUS_TOKEN = re.compile(r"^(?:OK|OP|RQ|CNX)$")
+_SERVICE_CUT_TOKEN = re.compile(r"^(?:[A-Z]+/[A-Z0-9]+|\d{1,2}|\d{2}-\d{2}-\d{2})$")
+
+
+def extract_page_rows(page):
+    """Group a pdfplumber page's words into rows and keep the booking rows.
+
+    Returns [[(x0, x1, text), ...], ...] with each row sorted by x0; only
+    rows containing a booking-number token are kept.
+    """
+    words = sorted(page.extract_words(), key=lambda w: (w["top"], w["x0"]))
+    rows = []
+    current = []
+    top = None
+    for w in words:
+        if top is None or w["top"] - top > TABLE_ROW_TOLERANCE:
+            if current:
+                rows.append(current)
+            current = []
+            top = w["top"]
+        current.append((round(w["x0"], 1), round(w["x1"], 1), w["text"]))
+    if current:
+        rows.append(current)
+    booking_rows = []
+    for row in rows:
+        if any(_BOOKING_TOKEN.match(text) for _, _, text in row):
+            row.sort()
+            booking_rows.append(row)
+    return booking_rows
+
+
+def _token_kind(token):
+    if _BOOKING_TOKEN.match(token):
+        return "booking"
+    if _DATE_TOKEN.match(token):
+        return "date"
+    if _STATUS_TOKEN.match(token):
+        return "status"
+    if token == "*":
+        return "service"
+    if _TITLE_TOKEN.match(token) or _CHILD_TOKEN.match(token):
+        return "name"
+    if token.isdigit():
+        return "number"
+    return "text"
+
+
+def _split_row(row, columns):
+    """Assign a row's words (sorted by x0) to columns; returns one token list per column."""
+    cells = [[] for _ in columns]
+    i = 0
+    for x0, _, text in row:
+        while i + 1 < len(columns) and x0 >= columns[i + 1] - TABLE_COLUMN_TOLERANCE:
+            i += 1
+        cells[i].append(text)
+    return cells
+
+
+def detect_table_layout(rows_by_page):
+    """Detect column starts and roles from the booking rows of a document.
+
+    A column starts where at least TABLE_COLUMN_SUPPORT of the sampled rows
+    start a cell (a word preceded by a gap wider than TABLE_COLUMN_GAP); its
+    role comes from the majority kind of the first token in that column.
+    Returns {"columns": [x, ...], "roles": [role, ...]} or None when no
+    booking/name/birth columns are found.
+    """
+    sample = [row for page_num in sorted(rows_by_page) for row in rows_by_page[page_num]][:TABLE_LAYOUT_SAMPLE]
+    if not sample:
+        return None
+    counts = Counter()
+    for row in sample:
+        prev_x1 = None
+        for x0, x1, _ in row:
+            if prev_x1 is None or x0 - prev_x1 > TABLE_COLUMN_GAP:
+                counts[round(x0)] += 1
+            prev_x1 = x1
+    clusters = []
+    for x in sorted(counts):
+        if clusters and x - clusters[-1][0] <= TABLE_COLUMN_TOLERANCE:
+            clusters[-1][1] += counts[x]
+        else:
+            clusters.append([x, counts[x]])
+    columns = [x for x, n in clusters if n >= TABLE_COLUMN_SUPPORT * len(sample)]
+    if len(columns) < 3:
+        return None
+
+    kinds = [Counter() for _ in columns]
+    for row in sample:
+        for i, cell in enumerate(_split_row(row, columns)):
+            if cell:
+                kinds[i][_token_kind(cell[0])] += 1
+
+    roles = []
+    for counter in kinds:
+        kind = counter.most_common(1)[0][0] if counter else None
+        seen = set(roles)
+        if kind == "booking" and "booking" not in seen:
+            role = "booking"
+        elif kind == "number" and "booking" in seen and "name" not in seen:
+            role = "pax"
+        elif kind == "name" or (kind == "text" and "booking" in seen and "name" not in seen):
+            role = "name"
+        elif kind == "date" and "name" in seen and "birth" not in seen:
+            role = "birth"
+        elif kind == "date":
+            role = "dates"
+        elif kind == "service" or (kind == "text" and "birth" in seen and "service" not in seen):
+            role = "service"
+        elif kind == "status":
+            role = "status"
+        else:
+            role = "other"
+        roles.append(role)
+    if not {"booking", "name", "birth"} <= set(roles):
+        return None
+    return {"columns": columns, "roles": roles}
+
+
+def build_table_index(rows_by_page, layout):
+    """Split every booking row into cells: booking -> [(page_num, cells, row_text), ...]."""
+    index = {}
+    columns, roles = layout["columns"], layout["roles"]
+    for page_num in sorted(rows_by_page):
+        for row in rows_by_page[page_num]:
+            cells = {}
+            for role, tokens in zip(roles, _split_row(row, columns)):
+                if tokens:
+                    cells.setdefault(role, []).extend(tokens)
+            booking = cells.get("booking")
+            if not booking or not _BOOKING_TOKEN.match(booking[0]):
+                continue
+            row_text = " ".join(text for _, _, text in row)
+            index.setdefault(booking[0], []).append((page_num, cells, row_text))
+    return index
+
+
+def build_table(rows_by_page):
+    """Layout plus cell index for a document, or None when no table layout is found."""
+    if not rows_by_page:
+        return None
+    layout = detect_table_layout(rows_by_page)
+    if not layout:
+        return None
+    return {"layout": layout, "index": build_table_index(rows_by_page, layout)}
+
+
+def parse_booking_table(pages, booking_no, table, prefix_arrival=None, prefix_departure=None, page_airlines=None, today=None):
+    """Table-engine counterpart of parse_booking; returns the same result shape."""
+    rows = table["index"].get(booking_no)
+    if not rows:
+        return None
+    matched_pages = [(page_num, None) for page_num in sorted({page_num for page_num, _, _ in rows})]
+    flights = _resolve_flights(pages, matched_pages, prefix_arrival, prefix_departure, page_airlines)
+
+    passenger_list = []
+    passenger_seen = set()
+    untitled = []
+    service_entries = []
+    status = None
+    dates_found = []
+    today = today or date.today()
+    max_year = today.year + 10
+
+    for page_num, cells, row_text in rows:
+        name_tokens = cells.get("name") or []
+        birth_cell = cells.get("birth") or []
+        birth = birth_cell[0] if birth_cell and _DATE_TOKEN.match(birth_cell[0]) else None
+        titled = False
+        birth_to_skip = None
+        if name_tokens and birth:
+            first = name_tokens[0]
+            name = None
+            if _TITLE_TOKEN.match(first):
+                titled = True
+                name = " ".join(name_tokens)
+                typ = next((t for tokens in cells.values() for t in tokens if _CHILD_TOKEN.match(t)), None)
+                if typ:
+                    age_suf = format_age_suffix(birth, today)
+                    if age_suf is not None:
+                        name = f"{typ} {name} ({age_suf})"
+            elif _CHILD_TOKEN.match(first) and len(name_tokens) > 1:
+                rest = " ".join(name_tokens[1:])
+                age_suf = format_age_suffix(birth, today)
+                name = f"{first} {rest} ({age_suf})" if age_suf is not None else f"{first} {rest}"
+            else:
+                untitled.append((name_tokens, birth, row_text))
+            if name is not None:
+                birth_to_skip = birth
+                if name not in passenger_seen:
+                    passenger_seen.add(name)
+                    passenger_list.append(name)
+
+        service_tokens = cells.get("service") or []
+        if service_tokens and service_tokens[0] == "*":
+            raw_tokens = []
+            for t in service_tokens[1:]:
+                if t == "DLX" or t.startswith("("):
+                    break
+                raw_tokens.append(t)
+        elif service_tokens and not titled:
+            raw_tokens = service_tokens
+        else:
+            raw_tokens = []
+        if raw_tokens:
+            cleaned_tokens = []
+            for t in raw_tokens:
+                if _SERVICE_CUT_TOKEN.match(t):
+                    break
+                cleaned_tokens.append(t)
+            if cleaned_tokens:
+                service_entries.append({"raw": " ".join(raw_tokens), "cleaned": " ".join(cleaned_tokens), "dates": [], "page": None})
+
+        status_cell = cells.get("status")
+        if status_cell and _STATUS_TOKEN.match(status_cell[0]):
+            status = status_cell[0]
+
+        parsed_dates = []
+        for role, tokens in cells.items():
+            for dstr in tokens:
+                if not _DATE_TOKEN.match(dstr) or (birth_to_skip and dstr == birth_to_skip):
+                    continue
+                d = _parse_date_str(dstr)
+                if d and 2000 <= d.year <= max_year:
+                    dates_found.append(d)
+                    parsed_dates.append(d)
+        if parsed_dates and service_entries:
+            for se in reversed(service_entries):
+                if se.get('page') is None:
+                    se['dates'].extend(parsed_dates)
+                    se['page'] = page_num
+                    break
+
+    service, hotel, service_date_ranges = _select_services(service_entries, passenger_list, booking_no)
+
+    # Same relaxed pass as parse_booking: untitled names only when nothing else matched
+    matched_lines = []
+    if not passenger_list:
+        matched_lines = [(page_num, row_text) for page_num, _, row_text in rows]
+        for name_tokens, birth, row_text in untitled:
+            if ACCOMMODATION_MATCHER.best_match(row_text.upper()):
+                continue
+            name = " ".join(name_tokens)
+            age_suf = format_age_suffix(birth, today)
+            typ_m = re.search(r"\b(Chd|Inf)\b", row_text, re.I)
+            if age_suf:
+                name = f"{typ_m.group(1)} {name} ({age_suf})" if typ_m else f"{name} ({age_suf})"
+            elif typ_m:
+                name = f"{typ_m.group(1)} {name}"
+            if name not in passenger_seen:
+                passenger_seen.add(name)
+                passenger_list.append(name)
+
+    return _booking_result(flights, passenger_list, service, hotel, service_date_ranges, status, dates_found, matched_lines)
+
+
+# Fields compared when checking two engines against each other
+PARITY_FIELDS = [
+    "arrival", "departure", "airline", "passengers", "pax_adult", "pax_child",
+    "service", "hotel", "service_date_ranges", "status", "start_date", "end_date",
+]
+
+
+def diff_results(expected, actual, fields=PARITY_FIELDS):
+    """Return the fields on which two parse results differ (all fields if only one is None)."""
+    if expected is None or actual is None:
+        return [] if expected is actual else list(fields)
+    expected = jsonable_result(expected)
+    actual = jsonable_result(actual)
+    return [f for f in fields if expected.get(f) != actual.get(f)]
+
+
 # -------------------
 # In-memory cache
 # -------------------
@@ -652,6 +1399,527 @@ def _cleanup_cache():
         except:
             pass
 
+# -------------------
+# Multi-document sessions
+# -------------------
+# A session holds one or more documents (manifests from different tour
+# operators) and a merged index: booking -> [(document position, page), ...].
+
+def build_document(filename, pages, profile=None, rows=None):
+    """Index one extracted PDF for a session.
+
+    `rows` (from extract_all_pages(..., rows=...)) adds the table engine's
+    layout and cell index.
+    """
+    return {
+        "id": str(uuid4()),
+        "filename": filename,
+        "pages": pages,
+        "index": run_stage(profile, "index", build_booking_index, pages),
+        "airlines": run_stage(profile, "airlines", build_page_airlines, pages),
+        "table": run_stage(profile, "table", build_table, rows) if rows is not None else None,
+    }
+
+
+def merge_booking_indexes(documents):
+    """Map booking -> [(document position, page number), ...], one entry per page.
+
+    build_booking_index has a hit per matching line, so a booking listed on
+    several lines of a page is collapsed to a single (document, page) pair.
+    """
+    merged = {}
+    for pos, doc in enumerate(documents):
+        for booking, hits in doc["index"].items():
+            sources = merged.setdefault(booking, [])
+            for page_num, _ in hits:
+                if (pos, page_num) not in sources:
+                    sources.append((pos, page_num))
+    return merged
+
+
+def new_session(documents):
+    return {
+        "documents": documents,
+        "index": merge_booking_indexes(documents),
+        "created": datetime.utcnow(),
+    }
+
+
+def _document_ref(doc):
+    return {"documentId": doc["id"], "filename": doc["filename"]}
+
+
+def resolve_booking(entry, booking, engine=None, today=None):
+    """Parse a booking in every session document that mentions it.
+
+    Returns [(document, result), ...] in upload order. Bookings missing from
+    the merged index fall back to parse_booking's own page scan. With the
+    table engine (PARSE_ENGINE unless `engine` is given), documents that have
+    a table index are parsed with parse_booking_table, falling back to
+    parse_booking for bookings that are not in a table row (e.g. free-text
+    lines). `today` (default: now) is the reference date for passenger ages.
+    """
+    engine = engine or PARSE_ENGINE
+    today = today or date.today()
+    documents = entry["documents"]
+    hits = entry["index"].get(booking)
+    if hits:
+        positions = sorted({pos for pos, _ in hits})
+        candidates = [(documents[pos], documents[pos]["index"][booking]) for pos in positions]
+    else:
+        candidates = [(doc, None) for doc in documents]
+    matches = []
+    for doc, pre_matched in candidates:
+        result = None
+        if engine == "table" and doc.get("table"):
+            result = parse_booking_table(doc["pages"], booking, doc["table"], page_airlines=doc["airlines"], today=today)
+        if result is None:
+            result = parse_booking(
+                doc["pages"], booking,
+                prefix_arrival=None,
+                prefix_departure=None,
+                pre_matched_pages=pre_matched,
+                page_airlines=doc["airlines"],
+                today=today
+            )
+        if result:
+            matches.append((doc, result))
+    return matches
+
+
+def parse_single_document(pages, booking, rows=None, engine=None, profile=None):
+    """Parse one booking from a freshly extracted document (the /api/parse path)."""
+    engine = engine or PARSE_ENGINE
+    table = run_stage(profile, "table", build_table, rows) if engine == "table" and rows is not None else None
+    if table:
+        result = run_stage(profile, "parse", parse_booking_table, pages, booking, table)
+        if result is not None:
+            return result
+    index = run_stage(profile, "index", build_booking_index, pages)
+    return run_stage(
+        profile, "parse", parse_booking,
+        pages, booking,
+        prefix_arrival=None,
+        prefix_departure=None,
+        pre_matched_pages=index.get(booking)
+    )
+
+
+def booking_sources(entry, booking):
+    documents = entry["documents"]
+    return [
+        {**_document_ref(documents[pos]), "page": page_num}
+        for pos, page_num in entry["index"].get(booking) or []
+    ]
+
+# -------------------
+# Request profiling
+# -------------------
+# Opt in per request with the X-Profile header, or sample a share of requests.
+PROFILE_HEADER = "x-profile"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_STORE_SIZE = int(os.environ.get("PROFILE_STORE_SIZE", "50"))
+PROFILE_TOP_FUNCTIONS = 25
+PROFILES = OrderedDict()
+
+
+class RequestProfile:
+    """cProfile stats and wall time per stage for one request."""
+
+    def __init__(self, endpoint, session_id=None):
+        self.id = str(uuid4())
+        self.endpoint = endpoint
+        self.session_id = session_id
+        self.created = datetime.utcnow()
+        self.stages = {}
+        self.stats = None
+        self._lock = threading.Lock()
+
+    def run(self, stage, fn, *args, **kwargs):
+        """Call fn under cProfile in the current thread and record its wall time.
+
+        If another profiler is already active the stage is still timed, just
+        without function-level stats.
+        """
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            prof = None
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t
+            if prof is not None:
+                prof.disable()
+            # Stages may run concurrently (one extraction per uploaded document)
+            with self._lock:
+                if prof is not None:
+                    if self.stats is None:
+                        self.stats = pstats.Stats(prof)
+                    else:
+                        self.stats.add(prof)
+                self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+
+    def top_functions(self, limit=PROFILE_TOP_FUNCTIONS):
+        if self.stats is None:
+            return []
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in self.stats.stats.items():
+            rows.append({
+                "function": f"{os.path.basename(filename)}:{line}({func})",
+                "calls": nc,
+                "self_ms": round(tt * 1000, 3),
+                "cumulative_ms": round(ct * 1000, 3),
+            })
+        rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+        return rows[:limit]
+
+    def summary(self, detail=False):
+        out = {
+            "profileId": self.id,
+            "endpoint": self.endpoint,
+            "created": self.created.isoformat() + "Z",
+            "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+        }
+        if detail:
+            out["top_functions"] = self.top_functions()
+        return out
+
+    def dump(self):
+        """Serialize the stats in the format written by pstats.Stats.dump_stats."""
+        return marshal.dumps(self.stats.stats if self.stats is not None else {})
+
+
+def start_profile(request, endpoint, session_id=None):
+    """Return a RequestProfile when this request opted in or was sampled, else None."""
+    flag = (request.headers.get(PROFILE_HEADER) or "").lower()
+    if flag in ("1", "true", "yes") or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        return RequestProfile(endpoint, session_id)
+    return None
+
+
+def run_stage(profile, stage, fn, *args, **kwargs):
+    if profile is None:
+        return fn(*args, **kwargs)
+    return profile.run(stage, fn, *args, **kwargs)
+
+
+def store_profile(profile):
+    if profile is None:
+        return
+    PROFILES[profile.id] = profile
+    while len(PROFILES) > PROFILE_STORE_SIZE:
+        PROFILES.popitem(last=False)
+    print(f"⏱️ Profile {profile.id[:8]} ({profile.endpoint}): {profile.summary()['stages_ms']}")
+
+
+def _profile_headers(profile):
+    headers = {}
+    if profile is not None:
+        headers["X-Profile-Id"] = profile.id
+    return headers
+
+# -------------------
+# Shadow evaluation
+# -------------------
+# For a sample of /api/search and /api/parse requests, a candidate parse
+# engine (and, for /api/parse, extraction mode) runs after the response has
+# been sent. Its output is diffed against what the agent received and both
+# latencies are recorded; GET /api/shadow summarizes the results. Profiled
+# requests are never shadowed.
+#
+# The table candidate needs word rows that production uploads do not extract.
+# For it, sampling is per session: a sampled upload gets its rows extracted
+# by a background task after the response, and every search in that session
+# is shadowed. Unsampled uploads pay nothing.
+SHADOW_HEADER = "x-shadow"
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0"))
+SHADOW_PARSE_ENGINE = os.environ.get("SHADOW_PARSE_ENGINE", "table")
+SHADOW_EXTRACT_ENGINE = os.environ.get("SHADOW_EXTRACT_ENGINE", "low_memory")
+SHADOW_STORE_SIZE = int(os.environ.get("SHADOW_STORE_SIZE", "1000"))
+SHADOW_RESULTS = deque(maxlen=SHADOW_STORE_SIZE)
+
+EXTRACT_ENGINES = {
+    "low_memory": lambda path, rows=None: extract_all_pages(path, low_memory=True, rows=rows),
+    "full": lambda path, rows=None: extract_all_pages(path, low_memory=False, rows=rows),
+}
+
+
+def _shadow_flag(request):
+    return (request.headers.get(SHADOW_HEADER) or "").lower() in ("1", "true", "yes")
+
+
+def start_shadow(request):
+    """True when this request opted in with X-Shadow or was sampled."""
+    return _shadow_flag(request) or (SHADOW_SAMPLE_RATE > 0 and random.random() < SHADOW_SAMPLE_RATE)
+
+
+def _shadow_needs_rows():
+    return SHADOW_PARSE_ENGINE == "table" and PARSE_ENGINE != "table"
+
+
+def shadow_upload(request, entry=None):
+    """Whether an upload's documents get a background table index for the candidate.
+
+    Documents added to an already sampled session are always indexed.
+    """
+    if not _shadow_needs_rows():
+        return False
+    if entry is not None and entry.get("shadow"):
+        return True
+    return start_shadow(request)
+
+
+def shadow_search_enabled(request, entry):
+    """Whether to shadow a search: per session for the table candidate, else per request."""
+    if _shadow_needs_rows():
+        return _shadow_flag(request) or bool(entry.get("shadow"))
+    return start_shadow(request)
+
+
+def shadow_index_documents(tmp_dir, pending):
+    """Background task: extract word rows for [(document, pdf path), ...] and attach their table.
+
+    Owns tmp_dir and removes it when done.
+    """
+    try:
+        for doc, path in pending:
+            rows = {}
+            EXTRACT_ENGINES[SHADOW_EXTRACT_ENGINE](path, rows=rows)
+            doc["table"] = build_table(rows)
+    except Exception as e:
+        print(f"⚠️ Shadow indexing error: {str(e)}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _diff_matches(production, candidate):
+    fields = []
+    if len(production) != len(candidate):
+        fields.append("documents")
+    for (_, expected), (_, actual) in zip(production, candidate):
+        fields.extend(f for f in diff_results(expected, actual) if f not in fields)
+    return fields
+
+
+def _record_shadow(endpoint, booking, production_s, candidate_s=None, fields=None, skipped=None):
+    # Records are served by GET /api/shadow, so they carry no booking or
+    # session ID; disagreements are logged with the booking instead.
+    if fields:
+        print(f"⚠️ Shadow disagreement ({endpoint}) on {booking}: {', '.join(fields)}")
+    record = {
+        "endpoint": endpoint,
+        "engine": SHADOW_PARSE_ENGINE,
+        "extract_engine": SHADOW_EXTRACT_ENGINE if endpoint == "parse" else None,
+        "created": datetime.utcnow().isoformat() + "Z",
+        "production_ms": round(production_s * 1000, 3),
+    }
+    if skipped:
+        record["skipped"] = skipped
+    else:
+        record.update({
+            "candidate_ms": round(candidate_s * 1000, 3),
+            "agree": not fields,
+            "fields": fields,
+            "speedup": production_s / candidate_s if candidate_s else None,
+        })
+    SHADOW_RESULTS.append(record)
+
+
+def shadow_search(entry, booking, production_matches, production_s):
+    """Background task: re-run a search with the candidate engine and record the diff."""
+    try:
+        if SHADOW_PARSE_ENGINE == "table" and not all(doc.get("table") for doc in entry["documents"]):
+            _record_shadow("search", booking, production_s, skipped="documents have no table index")
+            return
+        t = time.perf_counter()
+        matches = resolve_booking(entry, booking, engine=SHADOW_PARSE_ENGINE)
+        candidate_s = time.perf_counter() - t
+        _record_shadow("search", booking, production_s, candidate_s, _diff_matches(production_matches, matches))
+    except Exception as e:
+        print(f"⚠️ Shadow search error: {str(e)}")
+        _record_shadow("search", booking, production_s, skipped=f"error: {str(e)}")
+
+
+def shadow_parse(tmp_dir, tmp_path, booking, production_result, production_s):
+    """Background task: re-run a one-shot parse with the candidate extraction and engine.
+
+    Owns tmp_dir and removes it when done.
+    """
+    try:
+        t = time.perf_counter()
+        rows = {} if SHADOW_PARSE_ENGINE == "table" else None
+        pages = EXTRACT_ENGINES[SHADOW_EXTRACT_ENGINE](tmp_path, rows=rows)
+        result = parse_single_document(pages, booking, rows=rows, engine=SHADOW_PARSE_ENGINE)
+        candidate_s = time.perf_counter() - t
+        _record_shadow("parse", booking, production_s, candidate_s, diff_results(production_result, result))
+    except Exception as e:
+        print(f"⚠️ Shadow parse error: {str(e)}")
+        _record_shadow("parse", booking, production_s, skipped=f"error: {str(e)}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, -(-pct * len(sorted_values) // 100) - 1))
+    return sorted_values[int(k)]
+
+
+def _shadow_stats(records):
+    compared = [r for r in records if "skipped" not in r]
+    speedups = sorted(r["speedup"] for r in compared if r["speedup"])
+    production = sorted(r["production_ms"] for r in compared)
+    candidate = sorted(r["candidate_ms"] for r in compared)
+    return {
+        "samples": len(records),
+        "compared": len(compared),
+        "skipped": len(records) - len(compared),
+        "agreement_rate": sum(1 for r in compared if r["agree"]) / len(compared) if compared else None,
+        "field_mismatches": dict(Counter(f for r in compared for f in r["fields"])),
+        "speedup": {
+            "mean": sum(speedups) / len(speedups) if speedups else None,
+            **{f"p{p}": _percentile(speedups, p) for p in (5, 25, 50, 75, 95)},
+        },
+        "latency_ms": {
+            "production_p50": _percentile(production, 50),
+            "candidate_p50": _percentile(candidate, 50),
+            "production_p95": _percentile(production, 95),
+            "candidate_p95": _percentile(candidate, 95),
+        },
+    }
+
+
+def shadow_summary(recent=10):
+    recent = max(1, recent)
+    records = list(SHADOW_RESULTS)
+    return {
+        "config": {
+            "sample_rate": SHADOW_SAMPLE_RATE,
+            "production_engine": PARSE_ENGINE,
+            "candidate_engine": SHADOW_PARSE_ENGINE,
+            "candidate_extract_engine": SHADOW_EXTRACT_ENGINE,
+        },
+        **_shadow_stats(records),
+        "endpoints": {
+            endpoint: _shadow_stats([r for r in records if r["endpoint"] == endpoint])
+            for endpoint in sorted({r["endpoint"] for r in records})
+        },
+        "recent_disagreements": [r for r in records if r.get("agree") is False][-recent:],
+    }
+
+# -------------------
+# Export helpers
+# -------------------
+EXPORT_BATCH_SIZE = 25
+EXPORT_CSV_FIELDS = [
+    "booking", "document", "status", "service", "hotel", "start_date", "end_date",
+    "pax_adult", "pax_child", "passengers",
+    "arrival_flight", "arrival_time", "arrival_page", "arrival_airline",
+    "departure_flight", "departure_time", "departure_page", "departure_airline",
+    "error",
+]
+
+
+def _format_date(d):
+    return d.strftime("%d/%m/%Y") if isinstance(d, date) else d
+
+
+def jsonable_result(result):
+    """Return a copy of a parse_booking result that json.dumps can encode.
+
+    service_date_ranges holds date objects; they are rendered as dd/mm/YYYY
+    like start_date/end_date.
+    """
+    out = dict(result)
+    out["service_date_ranges"] = [
+        {"service": r.get("service"), "start": _format_date(r.get("start")), "end": _format_date(r.get("end"))}
+        for r in result.get("service_date_ranges") or []
+    ]
+    return out
+
+
+def export_csv_row(record):
+    """Flatten one export record into the EXPORT_CSV_FIELDS columns."""
+    arrival = record.get("arrival") or {}
+    departure = record.get("departure") or {}
+    airline = record.get("airline") or {}
+    return [
+        record.get("booking"),
+        (record.get("document") or {}).get("filename"),
+        record.get("status"),
+        record.get("service"),
+        record.get("hotel"),
+        record.get("start_date"),
+        record.get("end_date"),
+        record.get("pax_adult"),
+        record.get("pax_child"),
+        "; ".join(record.get("passengers") or []),
+        arrival.get("flight"),
+        arrival.get("time"),
+        arrival.get("page"),
+        airline.get("arrival"),
+        departure.get("flight"),
+        departure.get("time"),
+        departure.get("page"),
+        airline.get("departure"),
+        record.get("error"),
+    ]
+
+
+def parse_export_records(entry, bookings, today=None):
+    """Resolve `bookings` in a session and return their export records."""
+    today = today or date.today()
+    records = []
+    for booking in bookings:
+        try:
+            matches = resolve_booking(entry, booking, today=today)
+        except Exception as e:
+            records.append({"booking": booking, "error": str(e)})
+            continue
+        for doc, result in matches:
+            record = jsonable_result(result)
+            record["booking"] = booking
+            record["document"] = _document_ref(doc)
+            records.append(record)
+    return records
+
+
+async def iter_session_records(entry):
+    """Yield one export record per booking and document in a cached session.
+
+    Bookings are parsed in small batches on a worker thread so the event loop
+    stays free for interactive searches while a large export is running.
+    """
+    bookings = list(entry.get("index") or {})
+    # One reference date for the whole export, even across midnight
+    today = date.today()
+    for start in range(0, len(bookings), EXPORT_BATCH_SIZE):
+        batch = bookings[start:start + EXPORT_BATCH_SIZE]
+        records = await asyncio.to_thread(parse_export_records, entry, batch, today)
+        for record in records:
+            yield record
+
+
+async def _ndjson_stream(records):
+    async for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+async def _csv_stream(records):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_CSV_FIELDS)
+    yield buf.getvalue()
+    async for record in records:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(export_csv_row(record))
+        yield buf.getvalue()
+
 # ============================================
 # API Routes
 # ============================================
@@ -665,7 +1933,10 @@ def root():
         "endpoints": {
             "upload": "POST /api/upload",
             "search": "POST /api/search",
-            "parse": "POST /api/parse"
+            "parse": "POST /api/parse",
+            "export": "GET /api/sessions/{id}/export?format=ndjson|csv",
+            "profiles": "GET /api/profiles?sessionId=",
+            "shadow": "GET /api/shadow"
         }
     }
 
@@ -678,76 +1949,117 @@ def health():
     }
 
 @app.post("/api/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload PDF and cache for fast searching"""
-    print(f"📥 Received upload: {file.filename}")
+async def upload_pdf(
+    request: Request,
+    file: List[UploadFile] = File(...),
+    sessionId: Optional[str] = Form(None)
+):
+    """Upload one or more PDFs and cache them for fast searching.
+
+    Send several `file` parts to index multiple manifests in one session, or
+    pass `sessionId` to add documents to an existing session.
+    """
+    files = file
+    print(f"📥 Received upload: {', '.join(f.filename for f in files)}")
+    profile = start_profile(request, "upload", sessionId)
     
     _cleanup_cache()
     
     # Validate
-    if not file:
+    if not files:
         raise HTTPException(status_code=400, detail="No file provided")
     
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
+    for f in files:
+        if not f.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="File must be a PDF")
     
-    # Read content
-    content = await file.read()
-    file_size_mb = len(content) / (1024 * 1024)
-    print(f"📄 File size: {file_size_mb:.2f} MB")
+    entry = None
+    if sessionId:
+        entry = CACHE.get(sessionId)
+        if not entry:
+            print(f"❌ Session not found: {sessionId}")
+            raise HTTPException(status_code=404, detail="Session not found or expired")
     
-    # Limit file size to 15MB (Railway has more RAM)
-    if file_size_mb > 15:
-        raise HTTPException(status_code=400, detail="File too large (max 15MB)")
+    index_for_shadow = shadow_upload(request, entry)
+    background = None
     
     # Create temp directory
     tmp_dir = tempfile.mkdtemp()
-    tmp_path = os.path.join(tmp_dir, file.filename)
+    tmp_paths = [os.path.join(tmp_dir, f"{i}-{os.path.basename(f.filename)}") for i, f in enumerate(files)]
     
     try:
-        # Save file
-        print(f"💾 Saving to temp: {tmp_path}")
-        with open(tmp_path, "wb") as f:
-            f.write(content)
+        # Stream files to temp storage (size limit enforced while copying)
+        for f, tmp_path in zip(files, tmp_paths):
+            print(f"💾 Saving to temp: {tmp_path}")
+            file_size = await save_upload(f, tmp_path)
+            print(f"📄 File size: {file_size / (1024 * 1024):.2f} MB")
         
-        # Extract pages with timeout
-        print("📖 Extracting pages...")
+        # Extract all documents in parallel, with one overall timeout
+        print(f"📖 Extracting pages from {len(tmp_paths)} document(s)...")
+        doc_rows = [{} if PARSE_ENGINE == "table" else None for _ in tmp_paths]
         try:
-            pages = await asyncio.wait_for(
-                asyncio.to_thread(extract_all_pages, tmp_path),
-                timeout=45.0  # 45 seconds (Railway มี timeout ยาวกว่า)
+            extracted = await asyncio.wait_for(
+                asyncio.gather(*(
+                    asyncio.to_thread(run_stage, profile, "extract", extract_all_pages, tmp_path, rows=rows)
+                    for tmp_path, rows in zip(tmp_paths, doc_rows)
+                )),
+                timeout=EXTRACT_TIMEOUT_SECONDS  # 45 seconds by default (Railway มี timeout ยาวกว่า)
             )
-            print(f"✅ Extracted {len(pages)} pages")
+            print(f"✅ Extracted {sum(len(pages) for pages in extracted)} pages")
         except asyncio.TimeoutError:
             print("❌ Timeout extracting pages")
             raise HTTPException(status_code=504, detail="PDF processing timeout")
+        except ExtractionMemoryError as e:
+            print(f"❌ {str(e)}")
+            raise HTTPException(status_code=413, detail="PDF exceeds extraction memory budget")
         except Exception as e:
             print(f"❌ Error extracting: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
         
-        # Build index
+        # Build per-document indexes and the merged session index
         print("🔍 Building booking index...")
-        index = build_booking_index(pages)
-        print(f"✅ Index built: {len(index)} bookings found")
+        documents = [
+            build_document(f.filename, pages, profile, rows=rows)
+            for f, pages, rows in zip(files, extracted, doc_rows)
+        ]
         
-        # Create session
-        session_id = str(uuid4())
-        CACHE[session_id] = {
-            "pages": pages,
-            "index": index,
-            "created": datetime.utcnow()
-        }
+        if entry is None:
+            session_id = str(uuid4())
+            entry = new_session(documents)
+            CACHE[session_id] = entry
+        else:
+            session_id = sessionId
+            all_documents = entry["documents"] + documents
+            # Swap in a new list and index so running searches/exports keep a consistent view
+            entry["documents"] = all_documents
+            entry["index"] = merge_booking_indexes(all_documents)
+            # New documents get the full TTL
+            entry["created"] = datetime.utcnow()
+        if profile is not None:
+            profile.session_id = session_id
+        print(f"✅ Index built: {len(entry['index'])} bookings found")
+        
+        if index_for_shadow:
+            # The shadow task extracts table rows after the response and removes tmp_dir
+            entry["shadow"] = True
+            background = BackgroundTasks()
+            background.add_task(shadow_index_documents, tmp_dir, list(zip(documents, tmp_paths)))
         
         print(f"✅ Upload successful: {session_id}")
         
         return JSONResponse(
             content={
                 "sessionId": session_id,
-                "pages": len(pages),
-                "bookings": len(index),
+                "pages": sum(len(doc["pages"]) for doc in entry["documents"]),
+                "bookings": len(entry["index"]),
+                "documents": [
+                    {**_document_ref(doc), "pages": len(doc["pages"]), "bookings": len(doc["index"])}
+                    for doc in entry["documents"]
+                ],
                 "status": "success"
             },
-            headers={"Access-Control-Allow-Origin": "*"}
+            headers=_profile_headers(profile),
+            background=background
         )
     
     except HTTPException:
@@ -758,18 +2070,21 @@ async def upload_pdf(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
     
     finally:
-        try:
-            shutil.rmtree(tmp_dir)
-            print("🗑️ Cleaned up temp files")
-        except Exception as e:
-            print(f"⚠️ Cleanup error: {str(e)}")
+        store_profile(profile)
+        if not background:
+            try:
+                shutil.rmtree(tmp_dir)
+                print("🗑️ Cleaned up temp files")
+            except Exception as e:
+                print(f"⚠️ Cleanup error: {str(e)}")
 
 @app.post("/api/search")
 async def search_cache(
+    request: Request,
     booking: str = Form(...),
     sessionId: str = Form(...)
 ):
-    """Search cached PDF by booking number"""
+    """Search every document of a cached session by booking number"""
     print(f"🔍 Search: booking={booking}, session={sessionId[:8]}...")
     
     if not booking or not sessionId:
@@ -780,30 +2095,42 @@ async def search_cache(
         print(f"❌ Session not found: {sessionId}")
         raise HTTPException(status_code=404, detail="Session not found or expired")
     
-    pages = entry.get("pages")
-    index = entry.get("index")
-    pre_matched = index.get(booking) if index else None
+    profile = start_profile(request, "search", sessionId)
     
     try:
-        result = parse_booking(
-            pages, booking,
-            prefix_arrival=None,
-            prefix_departure=None,
-            pre_matched_pages=pre_matched
-        )
+        t = time.perf_counter()
+        matches = run_stage(profile, "parse", resolve_booking, entry, booking)
+        production_s = time.perf_counter() - t
         
-        if not result:
+        if not matches:
             print(f"❌ Booking not found: {booking}")
             raise HTTPException(status_code=404, detail="Booking not found")
         
-        result["booking"] = booking
-        result["sessionId"] = sessionId
+        # The first document's result stays at the top level; every
+        # document's result is listed when the booking spans several.
+        doc, result = matches[0]
+        out = jsonable_result(result)
+        out["booking"] = booking
+        out["sessionId"] = sessionId
+        out["document"] = _document_ref(doc)
+        out["sources"] = booking_sources(entry, booking)
+        if len(matches) > 1:
+            out["results"] = [
+                {**jsonable_result(r), "document": _document_ref(d)} for d, r in matches
+            ]
+        
+        print(f"✅ Search successful: {booking} ({len(matches)} document(s))")
         
-        print(f"✅ Search successful: {booking}")
+        background = None
+        # Profiled timings include cProfile overhead, so they are not compared
+        if profile is None and shadow_search_enabled(request, entry):
+            background = BackgroundTasks()
+            background.add_task(shadow_search, entry, booking, matches, production_s)
         
         return JSONResponse(
-            content=result,
-            headers={"Access-Control-Allow-Origin": "*"}
+            content=out,
+            headers=_profile_headers(profile),
+            background=background
         )
     
     except HTTPException:
@@ -812,57 +2139,61 @@ async def search_cache(
         print(f"❌ Search error: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+    
+    finally:
+        store_profile(profile)
 
 @app.post("/api/parse")
 async def parse_upload(
+    request: Request,
     booking: str = Form(...),
     file: UploadFile = File(...)
 ):
     """Parse PDF without caching (one-time use)"""
     print(f"📥 Parse: booking={booking}, file={file.filename}")
+    profile = start_profile(request, "parse")
     
     if not booking:
         raise HTTPException(status_code=400, detail="booking required")
     
-    content = await file.read()
-    file_size_mb = len(content) / (1024 * 1024)
-    
-    if file_size_mb > 15:
-        raise HTTPException(status_code=400, detail="File too large (max 15MB)")
-    
     tmp_dir = tempfile.mkdtemp()
     tmp_path = os.path.join(tmp_dir, file.filename)
+    # As in search_cache, a profiled request is never shadowed
+    shadow = profile is None and start_shadow(request)
+    background = None
     
     try:
-        with open(tmp_path, "wb") as f:
-            f.write(content)
+        await save_upload(file, tmp_path)
         
+        t = time.perf_counter()
+        rows = {} if PARSE_ENGINE == "table" else None
         try:
             pages = await asyncio.wait_for(
-                asyncio.to_thread(extract_all_pages, tmp_path),
-                timeout=45.0
+                asyncio.to_thread(run_stage, profile, "extract", extract_all_pages, tmp_path, rows=rows),
+                timeout=EXTRACT_TIMEOUT_SECONDS
             )
         except asyncio.TimeoutError:
             raise HTTPException(status_code=504, detail="PDF processing timeout")
+        except ExtractionMemoryError:
+            raise HTTPException(status_code=413, detail="PDF exceeds extraction memory budget")
         
-        index = build_booking_index(pages)
-        pre_matched = index.get(booking)
-        
-        result = parse_booking(
-            pages, booking,
-            prefix_arrival=None,
-            prefix_departure=None,
-            pre_matched_pages=pre_matched
-        )
+        result = parse_single_document(pages, booking, rows=rows, profile=profile)
+        production_s = time.perf_counter() - t
         
         if not result:
             raise HTTPException(status_code=404, detail="Booking not found")
         
         result["booking"] = booking
         
+        if shadow:
+            # The shadow task re-reads the saved PDF and removes tmp_dir afterwards
+            background = BackgroundTasks()
+            background.add_task(shadow_parse, tmp_dir, tmp_path, booking, result, production_s)
+        
         return JSONResponse(
-            content=result,
-            headers={"Access-Control-Allow-Origin": "*"}
+            content=jsonable_result(result),
+            headers=_profile_headers(profile),
+            background=background
         )
     
     except HTTPException:
@@ -873,21 +2204,69 @@ async def parse_upload(
         raise HTTPException(status_code=500, detail=str(e))
     
     finally:
-        try:
-            shutil.rmtree(tmp_dir)
-        except:
-            pass
+        store_profile(profile)
+        if not background:
+            try:
+                shutil.rmtree(tmp_dir)
+            except:
+                pass
 
-# OPTIONS handlers
-@app.options("/api/upload")
-@app.options("/api/search")
-@app.options("/api/parse")
-async def options_handler():
-    return Response(
-        status_code=200,
+@app.get("/api/sessions/{session_id}/export")
+async def export_session(session_id: str, format: str = "ndjson"):
+    """Stream every booking in a cached session as NDJSON or CSV"""
+    fmt = (format or "").lower()
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    
+    entry = CACHE.get(session_id)
+    if not entry:
+        print(f"❌ Session not found: {session_id}")
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    
+    print(f"📤 Export: session={session_id[:8]}..., format={fmt}, bookings={len(entry['index'])}")
+    
+    records = iter_session_records(entry)
+    if fmt == "csv":
+        body, media_type = _csv_stream(records), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _ndjson_stream(records), "application/x-ndjson"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
         headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "POST, OPTIONS",
-            "Access-Control-Allow-Headers": "*",
+            "Content-Disposition": f'attachment; filename="{session_id}.{fmt}"',
         }
-    )
\ No newline at end of file
+    )
+
+@app.get("/api/profiles")
+async def list_profiles(sessionId: Optional[str] = None):
+    """List stored request profiles of one session (newest first)"""
+    # The session ID is the only credential for a cached manifest, so never
+    # list other sessions' profiles (or echo their IDs)
+    if not sessionId:
+        raise HTTPException(status_code=400, detail="sessionId required")
+    profiles = [p for p in reversed(PROFILES.values()) if p.session_id == sessionId]
+    return JSONResponse(content={"profiles": [p.summary() for p in profiles]})
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, download: bool = False):
+    """Stage breakdown and top functions of a stored profile, or the raw pstats file with ?download=true"""
+    profile = PROFILES.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found or evicted")
+    
+    if download:
+        return Response(
+            content=profile.dump(),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": f'attachment; filename="{profile.endpoint}-{profile_id}.prof"',
+            }
+        )
+    return JSONResponse(content=profile.summary(detail=True))
+
+@app.get("/api/shadow")
+async def get_shadow(recent: int = 10):
+    """Agreement rate, field mismatches and speedup of the shadow engine against production"""
+    return JSONResponse(content=shadow_summary(recent=recent))
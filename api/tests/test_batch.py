@@ -0,0 +1,61 @@
+import csv
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from api import batch
+from api.tests.test_e2e import make_pdf_bytes
+
+
+def _write_pdf(path, text):
+    with open(path, "wb") as f:
+        f.write(make_pdf_bytes(text))
+
+
+def test_batch_jsonl_and_resume(tmp_path):
+    indir = tmp_path / "in"
+    indir.mkdir()
+    _write_pdf(indir / "a.pdf", "111111 1 Mr John Doe 01-01-90 * KATATHANI RESORT OK")
+    _write_pdf(indir / "b.pdf", "222222 1 Mrs Jane Doe 02-02-85 * KORA RESORT OK\n333333 1 Mr Bob Roe 03-03-80")
+    out = tmp_path / "bookings.jsonl"
+
+    assert batch.main([str(indir), "--out", str(out), "--workers", "2"]) == 0
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(r["booking"] for r in records) == ["111111", "222222", "333333"]
+    assert {os.path.basename(r["document"]["filename"]) for r in records} == {"a.pdf", "b.pdf"}
+
+    # A resumed run skips completed files and keeps the output intact
+    _write_pdf(indir / "c.pdf", "444444 1 Ms Ann Poe 04-04-75")
+    assert batch.main([str(indir), "--out", str(out), "--resume", "--workers", "1"]) == 0
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(r["booking"] for r in records) == ["111111", "222222", "333333", "444444"]
+
+
+def test_batch_csv_from_glob(tmp_path):
+    _write_pdf(tmp_path / "x.pdf", "555555 1 Mr John Doe 01-01-90 * CAPE HOTEL OK")
+    out = tmp_path / "bookings.csv"
+
+    assert batch.main([str(tmp_path / "*.pdf"), "--out", str(out), "--workers", "1"]) == 0
+    rows = list(csv.DictReader(out.read_text().splitlines()))
+    assert [r["booking"] for r in rows] == ["555555"]
+    assert rows[0]["status"] == "OK"
+
+
+def test_resume_with_missing_or_short_output_starts_over(tmp_path):
+    indir = tmp_path / "in"
+    indir.mkdir()
+    _write_pdf(indir / "a.pdf", "111111 1 Mr John Doe 01-01-90 * KATATHANI RESORT OK")
+    _write_pdf(indir / "b.pdf", "222222 1 Mrs Jane Doe 02-02-85 * KORA RESORT OK")
+    out = tmp_path / "bookings.jsonl"
+    assert batch.main([str(indir), "--out", str(out), "--workers", "1"]) == 0
+
+    for damage in (lambda: out.unlink(), lambda: out.write_text("")):
+        damage()
+        assert batch.main([str(indir), "--out", str(out), "--resume", "--workers", "1"]) == 0
+        data = out.read_text()
+        assert "\0" not in data
+        assert sorted(json.loads(line)["booking"] for line in data.splitlines()) == ["111111", "222222"]
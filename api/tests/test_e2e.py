@@ -77,3 +77,289 @@ def test_one_shot_parse():
     assert resp.status_code == 200, resp.text
     j = resp.json()
     assert j.get("booking") == booking or booking in str(j), j
+
+
+def test_session_export_ndjson_and_csv():
+    import csv
+    import json
+
+    bookings = ["111111", "222222"]
+    sample_text = "\n".join(
+        [f"{b} 1 Mr John Doe{i} 01-01-90 * KATATHANI RESORT DLX OK" for i, b in enumerate(bookings)]
+    )
+    pdf_bytes = make_pdf_bytes(sample_text)
+
+    from api.main import app
+    client = TestClient(app)
+
+    files = {"file": ("export.pdf", pdf_bytes, "application/pdf")}
+    resp = client.post("/api/upload", files=files)
+    assert resp.status_code == 200, resp.text
+    session_id = resp.json()["sessionId"]
+
+    resp = client.get(f"/api/sessions/{session_id}/export")
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in resp.text.splitlines() if line]
+    assert [r["booking"] for r in records] == bookings
+    assert records[0]["status"] == "OK"
+
+    resp = client.get(f"/api/sessions/{session_id}/export", params={"format": "csv"})
+    assert resp.status_code == 200, resp.text
+    rows = list(csv.DictReader(resp.text.splitlines()))
+    assert [r["booking"] for r in rows] == bookings
+
+    assert client.get(f"/api/sessions/{session_id}/export", params={"format": "xml"}).status_code == 400
+    assert client.get("/api/sessions/missing/export").status_code == 404
+
+
+def test_upload_over_size_limit_is_rejected(monkeypatch):
+    from api import main
+    monkeypatch.setattr(main, "MAX_UPLOAD_MB", 0.001)
+    client = TestClient(main.app)
+
+    pdf_bytes = make_pdf_bytes("Booking 123456\n" + "filler line\n" * 200)
+    assert len(pdf_bytes) > 0.001 * 1024 * 1024
+    files = {"file": ("big.pdf", pdf_bytes, "application/pdf")}
+    resp = client.post("/api/upload", files=files)
+    assert resp.status_code == 400, resp.text
+    assert resp.json()["detail"] == "File too large (max 0.001MB)"
+
+
+def test_profiling_opt_in_and_download():
+    import marshal
+
+    booking = "345678"
+    pdf_bytes = make_pdf_bytes(f"Flight number 1234\n{booking} 1 Mr John Doe 01-01-90 * KATATHANI RESORT OK")
+
+    from api.main import app
+    client = TestClient(app)
+
+    files = {"file": ("prof.pdf", pdf_bytes, "application/pdf")}
+    resp = client.post("/api/upload", files=files, headers={"X-Profile": "1"})
+    assert resp.status_code == 200, resp.text
+    session_id = resp.json()["sessionId"]
+    upload_profile = resp.headers["X-Profile-Id"]
+
+    resp = client.post("/api/search", data={"booking": booking, "sessionId": session_id}, headers={"X-Profile": "1"})
+    assert resp.status_code == 200, resp.text
+    search_profile = resp.headers["X-Profile-Id"]
+
+    # Requests without the header are not profiled
+    resp = client.post("/api/search", data={"booking": booking, "sessionId": session_id})
+    assert "X-Profile-Id" not in resp.headers
+
+    listed = client.get("/api/profiles", params={"sessionId": session_id}).json()["profiles"]
+    assert [p["profileId"] for p in listed] == [search_profile, upload_profile]
+    assert set(listed[1]["stages_ms"]) == {"extract", "index", "airlines"}
+    assert all("sessionId" not in p for p in listed)
+
+    # Listing requires the session; profiles of other sessions are never exposed
+    assert client.get("/api/profiles").status_code == 400
+    assert client.get("/api/profiles", params={"sessionId": "someone-else"}).json()["profiles"] == []
+
+    detail = client.get(f"/api/profiles/{search_profile}").json()
+    assert "parse" in detail["stages_ms"]
+    assert any("parse_booking" in f["function"] for f in detail["top_functions"])
+
+    raw = client.get(f"/api/profiles/{search_profile}", params={"download": "true"})
+    assert raw.status_code == 200
+    assert isinstance(marshal.loads(raw.content), dict)
+
+    assert client.get("/api/profiles/missing").status_code == 404
+
+
+def test_cors_preflight_headers_and_error_mapping(monkeypatch):
+    from api import main
+    client = TestClient(main.app)
+
+    resp = client.options("/api/search", headers={"Origin": "http://example.com", "Access-Control-Request-Method": "POST"})
+    assert resp.status_code == 200
+    assert resp.headers["access-control-allow-origin"] == "*"
+    assert "POST" in resp.headers["access-control-allow-methods"]
+
+    resp = client.get("/health", headers={"Origin": "http://example.com"})
+    assert resp.status_code == 200
+    assert resp.headers["access-control-allow-origin"] == "*"
+
+    # HTTPExceptions keep their status and still carry CORS headers
+    resp = client.post("/api/search", data={"booking": "1", "sessionId": "missing"})
+    assert resp.status_code == 404
+    assert resp.headers["access-control-allow-origin"] == "*"
+
+    # Unhandled exceptions become a JSON 500
+    def boom():
+        raise RuntimeError("boom")
+    monkeypatch.setattr(main, "_cleanup_cache", boom)
+    files = {"file": ("x.pdf", b"%PDF", "application/pdf")}
+    resp = client.post("/api/upload", files=files)
+    assert resp.status_code == 500
+    assert resp.json() == {"detail": "Server error: boom"}
+    assert resp.headers["access-control-allow-origin"] == "*"
+
+
+def test_multi_document_session_search():
+    shared = "777777"
+    pdf_a = make_pdf_bytes(f"{shared} 1 Mr John Doe 01-01-90 * KATATHANI RESORT OK\n111222 1 Mr Only InA 01-01-90")
+    pdf_b = make_pdf_bytes(f"Filler page line\n{shared} 1 Mrs Jane Doe 02-02-85 * KORA RESORT OK")
+    pdf_c = make_pdf_bytes("333444 1 Mr Late Upload 03-03-80 * CAPE HOTEL OK")
+
+    from api.main import app
+    client = TestClient(app)
+
+    files = [
+        ("file", ("operator-a.pdf", pdf_a, "application/pdf")),
+        ("file", ("operator-b.pdf", pdf_b, "application/pdf")),
+    ]
+    resp = client.post("/api/upload", files=files)
+    assert resp.status_code == 200, resp.text
+    j = resp.json()
+    session_id = j["sessionId"]
+    assert [d["filename"] for d in j["documents"]] == ["operator-a.pdf", "operator-b.pdf"]
+
+    # Add a third document to the same session
+    resp = client.post("/api/upload", files={"file": ("operator-c.pdf", pdf_c, "application/pdf")}, data={"sessionId": session_id})
+    assert resp.status_code == 200, resp.text
+    assert len(resp.json()["documents"]) == 3
+
+    resp = client.post("/api/search", data={"booking": shared, "sessionId": session_id})
+    assert resp.status_code == 200, resp.text
+    out = resp.json()
+    assert out["document"]["filename"] == "operator-a.pdf"
+    assert [(s["filename"], s["page"]) for s in out["sources"]] == [("operator-a.pdf", 1), ("operator-b.pdf", 1)]
+    assert [r["passengers"] for r in out["results"]] == [["Mr John Doe"], ["Mrs Jane Doe"]]
+
+    resp = client.post("/api/search", data={"booking": "333444", "sessionId": session_id})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["document"]["filename"] == "operator-c.pdf"
+    assert "results" not in resp.json()
+
+
+def test_shadow_mode_compares_candidate_engine():
+    from api import main
+    from api.bench.synthetic import manifest_bytes
+
+    booking = "424242"
+    pdf_bytes = make_pdf_bytes(f"{booking} 1 Mr John Doe 01-01-90 * KATATHANI RESORT OK")
+    main.SHADOW_RESULTS.clear()
+    client = TestClient(main.app)
+
+    # One-shot parse: the candidate re-extracts and parses after the response
+    files = {"file": ("shadow.pdf", pdf_bytes, "application/pdf")}
+    resp = client.post("/api/parse", data={"booking": booking}, files=files, headers={"X-Shadow": "1"})
+    assert resp.status_code == 200, resp.text
+
+    # Unsampled uploads extract no table rows; a forced search there is skipped
+    session_id = client.post("/api/upload", files=files).json()["sessionId"]
+    assert main.CACHE[session_id]["documents"][0]["table"] is None
+    resp = client.post("/api/search", data={"booking": booking, "sessionId": session_id}, headers={"X-Shadow": "1"})
+    assert resp.status_code == 200, resp.text
+
+    # Requests without the header are not sampled by default
+    client.post("/api/search", data={"booking": booking, "sessionId": session_id})
+
+    # Profiled requests are not shadowed: cProfile would inflate the production time
+    resp = client.post("/api/search", data={"booking": booking, "sessionId": session_id},
+                       headers={"X-Shadow": "1", "X-Profile": "1"})
+    assert resp.status_code == 200 and "X-Profile-Id" in resp.headers
+    resp = client.post("/api/parse", data={"booking": booking}, files=files, headers={"X-Shadow": "1", "X-Profile": "1"})
+    assert resp.status_code == 200, resp.text
+
+    # A sampled upload is indexed for the candidate after the response, and
+    # every search in that session is shadowed
+    manifest, bookings = manifest_bytes(2)
+    resp = client.post("/api/upload", files={"file": ("m.pdf", manifest, "application/pdf")}, headers={"X-Shadow": "1"})
+    shadow_session = resp.json()["sessionId"]
+    assert main.CACHE[shadow_session]["documents"][0]["table"] is not None
+    for b in bookings[:3]:
+        client.post("/api/search", data={"booking": b, "sessionId": shadow_session})
+
+    summary = client.get("/api/shadow").json()
+    assert summary["samples"] == 5
+    assert summary["compared"] == 4 and summary["skipped"] == 1
+    assert summary["agreement_rate"] == 1.0
+    assert summary["endpoints"]["parse"]["speedup"]["p50"] > 0
+    assert summary["recent_disagreements"] == []
+
+    # The public summary never exposes bookings or session IDs
+    main._record_shadow("search", booking, 0.002, 0.001, ["hotel"])
+    main._record_shadow("search", booking, 0.002, 0.001, ["status"])
+    recent = client.get("/api/shadow", params={"recent": 0}).json()["recent_disagreements"]
+    assert [r["fields"] for r in recent] == [["status"]]
+    assert not any(key in r for r in recent for key in ("booking", "sessionId"))
+
+
+def test_save_upload_reports_the_limit_it_enforced(tmp_path):
+    import asyncio
+    from fastapi import HTTPException
+    from starlette.datastructures import UploadFile
+    from api import main
+
+    upload = UploadFile(file=io.BytesIO(b"x" * 4096), filename="big.pdf")
+    try:
+        asyncio.run(main.save_upload(upload, str(tmp_path / "big.pdf"), max_mb=0.002))
+    except HTTPException as e:
+        assert e.status_code == 400
+        assert e.detail == "File too large (max 0.002MB)"
+    else:
+        raise AssertionError("upload over max_mb was accepted")
+
+
+def test_memory_budget_tolerates_missing_rss(monkeypatch, tmp_path):
+    from api import main
+
+    # Over budget on the first check, then /proc becomes unreadable
+    readings = iter([100, 10 ** 6, None])
+    monkeypatch.setattr(main, "_current_rss_mb", lambda: next(readings, None))
+    path = tmp_path / "one.pdf"
+    path.write_bytes(make_pdf_bytes("123456 1 Mr John Doe 01-01-90"))
+    pages = main.extract_all_pages(str(path), memory_budget_mb=1)
+    assert len(pages) == 1
+
+
+def test_memory_budget_counts_growth_not_memory_already_held(monkeypatch, tmp_path):
+    from api import main
+
+    path = tmp_path / "one.pdf"
+    path.write_bytes(make_pdf_bytes("123456 1 Mr John Doe 01-01-90"))
+
+    # Sessions etc. already hold far more than the budget before extraction starts
+    monkeypatch.setattr(main, "_current_rss_mb", lambda: 5000.0)
+    assert len(main.extract_all_pages(str(path), memory_budget_mb=150)) == 1
+
+    # Growth past the budget still fails, even after flushing
+    readings = iter([5000.0, 5200.0, 5200.0])
+    monkeypatch.setattr(main, "_current_rss_mb", lambda: next(readings))
+    try:
+        main.extract_all_pages(str(path), memory_budget_mb=150)
+    except main.ExtractionMemoryError as e:
+        assert "grew RSS by 200 MB" in str(e)
+    else:
+        raise AssertionError("growth over the budget was accepted")
+
+
+def test_session_sources_are_unique_and_appends_refresh_ttl():
+    from datetime import datetime, timedelta
+    from api import main
+    client = TestClient(main.app)
+
+    booking = "818181"
+    pdf = make_pdf_bytes(
+        f"{booking} 1 Mr John Doe 01-01-90 * KORA RESORT OK\n"
+        f"{booking} 2 Mrs Jane Doe 02-02-85\n"
+        f"{booking} 3 Chd Anna Doe 01-02-18"
+    )
+    resp = client.post("/api/upload", files={"file": ("family.pdf", pdf, "application/pdf")})
+    session_id = resp.json()["sessionId"]
+
+    resp = client.post("/api/search", data={"booking": booking, "sessionId": session_id})
+    assert resp.status_code == 200, resp.text
+    assert [(s["filename"], s["page"]) for s in resp.json()["sources"]] == [("family.pdf", 1)]
+
+    # Appending a document restarts the session's TTL
+    stale = datetime.utcnow() - timedelta(seconds=main.CACHE_TTL_SECONDS - 1)
+    main.CACHE[session_id]["created"] = stale
+    other = make_pdf_bytes("929292 1 Mr Late Upload 03-03-80 * CAPE HOTEL OK")
+    resp = client.post("/api/upload", files={"file": ("late.pdf", other, "application/pdf")}, data={"sessionId": session_id})
+    assert resp.status_code == 200, resp.text
+    assert main.CACHE[session_id]["created"] > stale
@@ -0,0 +1,168 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from datetime import date
+
+from api import main
+
+
+def test_airline_rules_detection_and_formatting():
+    pages = [
+        (1, "Flight number 281 PLL LOT arrival"),
+        (2, "NEOS AIR flight 12 and a LOT mention"),
+        (3, "Neos Air flight 12"),
+        (4, "BLOT NEOSX no airline here"),
+    ]
+    assert main.build_page_airlines(pages) == {1: "LOT", 2: "LOT", 3: "Neos Air"}
+    assert main._format_by_airline("12", "Neos Air") == "NO0012"
+    assert main._format_by_airline("281", "LOT") == "LOT281"
+    assert main._format_by_airline("281", None) == "281"
+    assert main._page_text(pages, 3) == "Neos Air flight 12"
+
+
+def test_hotel_dictionary_matches_on_word_boundaries():
+    matcher = main.KeywordAutomaton(["LA", "CHA-DA", "KATATHANI", "THANI", "RESORT", "resort"])
+    assert matcher.keywords == ["LA", "CHA-DA", "KATATHANI", "THANI", "RESORT"]
+    assert matcher.best_match("KATATHANI RESORT DLX") == "KATATHANI"
+    assert matcher.best_match("CHA-DA BEACH") == "CHA-DA"
+    # Short keywords do not fire inside longer words
+    assert matcher.best_match("PLAYA ISLAND") is None
+
+    pages = [(1, "123456 1 Mr John Doe 01-01-90\n123456 * KATATHANI RESORT DLX OK")]
+    result = main.parse_booking(pages, "123456")
+    assert result["service"] == "KATATHANI RESORT"
+    assert result["hotel"] == "KATATHANI"
+
+
+def _row(cells, columns=(20, 62, 78, 200, 245, 400, 440, 482)):
+    # Lay cells out at fixed column positions, 4pt per character, 2pt word spacing
+    words = []
+    for x, cell in zip(columns, cells):
+        for token in cell.split():
+            words.append((float(x), float(x + 4 * len(token)), token))
+            x += 4 * len(token) + 2
+    return words
+
+
+def test_table_engine_matches_regex_engine():
+    lines = [
+        ["1234567", "1", "Mrs Petra Rossi", "20-05-84", "* KATATHANI RESORT DLX", "19-11-26", "26-11-26", "OK"],
+        ["1234567", "2", "Chd Anna Rossi", "01-02-18", "* KATATHANI RESORT DLX", "19-11-26", "26-11-26", "OK"],
+        ["7654321", "1", "Mr Jan Novak", "03-11-71", "* CAPE HOTEL", "12-11-26", "19-11-26", "RQ"],
+    ]
+    text = "Flight number 281 PLL LOT\nArrival time 10:30\n" + "\n".join(" ".join(line) for line in lines)
+    pages = [(1, text)]
+    rows = {1: [_row(line) for line in lines]}
+
+    table = main.build_table(rows)
+    assert table["layout"]["roles"] == ["booking", "pax", "name", "birth", "service", "dates", "dates", "status"]
+
+    index = main.build_booking_index(pages)
+    for booking in ("1234567", "7654321"):
+        expected = main.parse_booking(pages, booking, pre_matched_pages=index[booking])
+        actual = main.parse_booking_table(pages, booking, table)
+        assert main.diff_results(expected, actual) == [], (expected, actual)
+    assert main.parse_booking_table(pages, "0000000", table) is None
+
+
+def test_date_tokens_match_strptime_order_and_age_uses_given_today():
+    from datetime import datetime
+
+    def reference(token):
+        for fmt in main.DATE_FORMATS:
+            try:
+                return datetime.strptime(token, fmt).date()
+            except ValueError:
+                continue
+        return None
+
+    tokens = ["12-11-26", "31-12-99", "30-02-26", "01-13-90", "2026-11-12", "12-11-2026",
+              "00-00-00", "1-2-03", "12/11/26", "ab-cd-ef", "2026-02-30"]
+    for token in tokens:
+        assert main._parse_date_str(token) == reference(token), token
+    assert main._parse_date_str(None) is None
+
+    today = date(2026, 10, 19)
+    assert main.format_age_suffix("01-01-90", today) == "36YO"
+    assert main.format_age_suffix("26-05-01", today) == "5Month"
+    assert main.format_age_suffix("bad", today) is None
+
+    pages = [(1, "123456 1 Chd Anna Novak 18-01-01 * KATATHANI RESORT 12-11-26 OK")]
+    result = main.parse_booking(pages, "123456", today=today)
+    assert result["passengers"] == ["Chd Anna Novak (8YO)"]
+
+
+def test_untitled_names_with_generic_tokens_are_kept():
+    today = date(2026, 10, 19)
+    for line, passenger in [
+        ("123456 1 LE VAN AN 01-01-90", "1 LE VAN AN (36YO)"),
+        ("123456 1 MY LINH TRAN 01-01-90", "1 MY LINH TRAN (36YO)"),
+        ("123456 1 ANNA THE BEST 01-01-90", "1 ANNA THE BEST (36YO)"),
+        ("123456 1 JAN NOVAK 01-01-90 KRABI", "1 JAN NOVAK (36YO)"),
+    ]:
+        result = main.parse_booking([(1, line)], "123456", today=today)
+        assert result["passengers"] == [passenger], line
+
+    # Strong accommodation words still keep hotel lines out of the passenger list
+    result = main.parse_booking([(1, "123456 1 SOFITEL KRABI 01-01-90")], "123456")
+    assert result["passengers"] == []
+
+    # A generic word on a transfer line is not reported as the hotel
+    result = main.parse_booking([(1, "123456 1 Mr John Doe 01-01-90\n123456 * TRANSFER TO THE AIRPORT OK")], "123456")
+    assert result["hotel"] is None
+
+
+def test_table_engine_falls_back_for_bookings_outside_table_rows(monkeypatch):
+    lines = [
+        ["1234567", "1", "Mrs Petra Rossi", "20-05-84", "* KATATHANI RESORT DLX", "19-11-26", "26-11-26", "OK"],
+        ["7654321", "1", "Mr Jan Novak", "03-11-71", "* CAPE HOTEL", "12-11-26", "19-11-26", "RQ"],
+    ]
+    free_text = "Note: 5550001 1 Mr Late Add 04-04-80 * KORA RESORT OK"
+    pages = [(1, "\n".join(" ".join(line) for line in lines) + "\n" + free_text)]
+    rows = {1: [_row(line) for line in lines]}
+    monkeypatch.setattr(main, "PARSE_ENGINE", "table")
+
+    entry = main.new_session([main.build_document("mixed.pdf", pages, rows=rows)])
+    assert entry["documents"][0]["table"] is not None
+    assert main.parse_booking_table(pages, "5550001", entry["documents"][0]["table"]) is None
+
+    expected = main.parse_booking(pages, "5550001")
+    [(_, result)] = main.resolve_booking(entry, "5550001")
+    assert main.diff_results(expected, result) == []
+    assert main.diff_results(expected, main.parse_single_document(pages, "5550001", rows=rows)) == []
+
+
+def test_hotel_reports_property_before_location_and_generic_words():
+    assert main.match_hotel("KORA RESORT") == (True, "KORA")
+    assert main.match_hotel("CAPE HOTEL") == (True, "CAPE")
+    assert main.match_hotel("LE MERIDIEN PHUKET") == (True, "LE MERIDIEN")
+    assert main.match_hotel("PATONG HOTEL PHUKET") == (True, "PHUKET")
+    assert main.match_hotel("GRAND HOTEL") == (True, "HOTEL")
+    # Weak words count as a hotel line but are never reported
+    assert main.match_hotel("THE SHORE") == (True, None)
+    assert main.match_hotel("AIRPORT TRANSFER") == (False, None)
+
+    # A weak-only service line is still picked over a transfer, as before the dictionary
+    text = "123456 1 Mr John Doe 01-01-90\n123456 * AIRPORT TRANSFER OK\n123456 * THE SHORE OK"
+    result = main.parse_booking([(1, text)], "123456")
+    assert result["service"] == "THE SHORE OK"
+    assert result["hotel"] is None
+
+
+def test_hotel_keyword_file_sections(tmp_path):
+    path = tmp_path / "keywords.txt"
+    path.write_text("# comment\nKORA\n[generic]\n*HOTEL\n[weak]\nTHE\n", encoding="utf-8")
+    assert main.load_hotel_keywords(str(path)) == [
+        ("KORA", "property", False), ("HOTEL", "generic", True), ("THE", "weak", False),
+    ]
+    path.write_text("[brand]\nKORA\n", encoding="utf-8")
+    try:
+        main.load_hotel_keywords(str(path))
+    except ValueError as e:
+        assert "[brand]" in str(e)
+    else:
+        raise AssertionError("unknown section was accepted")
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_extraction_stack_is_imported_lazily():
+    # A fresh interpreter must be able to import the app without pulling in
+    # pdfplumber or its dependencies; they load on the first extraction.
+    code = (
+        "import sys, api.main\n"
+        "heavy = [m for m in ('pdfplumber', 'pdfminer', 'PIL', 'pypdfium2') if m in sys.modules]\n"
+        "print(','.join(heavy))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "", proc.stdout